@@ -3,23 +3,20 @@
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from ferramentas import consultar_inventario, fazer_oferta, plantar_semente, aceitar_oferta, rejeitar_oferta, fazer_contra_oferta
-
-def criar_agente(nome_agente: str, role_prompt: str, tools: list, llm: ChatOpenAI):
-    prompt = ChatPromptTemplate.from_messages(
-        [("system", role_prompt), MessagesPlaceholder(variable_name="chat_history", optional=True), ("user", "{input}"),
-         MessagesPlaceholder(variable_name="agent_scratchpad"), ])
-    agent = create_tool_calling_agent(llm, tools, prompt)
-    return AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
-
-def inicializar_agentes(llm: ChatOpenAI, agricultores_ids: list):
-    """Inicializa os agentes com prompts de negociação."""
-
-    empresario_prompt = """
-    Você é um Empresário. Sua meta é maximizar o lucro.
-    Você é o único fornecedor de todos os itens. Os agricultores farão ofertas para comprar seus produtos.
-
-    Tabela de preços (Use estes IDs exatos):
+from modelo_streaming import ModeloStreaming
+from ferramentas import consultar_inventario, fazer_oferta, fazer_oferta_cesta, plantar_semente, aceitar_oferta, \
+    rejeitar_oferta, fazer_contra_oferta, responder_ofertas, precificar_oferta
+from collections import OrderedDict
+from collections.abc import Mapping
+import threading
+
+# Executores de agricultor mantidos em memória ao mesmo tempo (os menos usados são descartados e recriados).
+MAX_EXECUTORES_AGRICULTORES = 256
+
+# Início comum a todos os prompts de sistema. Precisa ser idêntico byte a byte entre os agentes para que o
+# servidor local reaproveite o cache de prefixo (KV) do prompt; o que varia por agente vem depois dele.
+TABELA_PRECOS = """
+    Tabela de preços (use estes IDs exatos):
     - sementes: soja, arroz, hortalica
     - fertilizantes: fertilizante-comum, fertilizante-premium, fertilizante-super-premium
     - agrotoxicos: agrotoxico-comum, agrotoxico-premium, agrotoxico-super-premium
@@ -31,53 +28,120 @@ def inicializar_agentes(llm: ChatOpenAI, agricultores_ids: list):
     agrotoxico-comum: 30, agrotoxico-premium: 60, agrotoxico-super-premium: 90
     pacote1: 30, pacote2: 60, pacote3: 90
     pulverizador: 400
+"""
+
+PROMPT_EMPRESARIO = TABELA_PRECOS + """
+    Você é um Empresário. Sua meta é maximizar o lucro.
+    Você é o único fornecedor de todos os itens. Os agricultores farão ofertas para comprar seus produtos.
 
     **REGRAS DE NEGOCIAÇÃO:**
-    1.  **Avalie a Oferta:** Quando um agricultor fizer uma oferta, avalie o `preco_proposto`.
+    1.  **Avalie a Oferta:** Cada oferta tem um `oferta_id` (ex.: 'OF3'). Avalie o `preco_proposto` de cada uma.
+        Uma oferta pode ser uma CESTA com vários itens e quantidades por um preço total; compare esse preço com a soma dos preços de tabela (`precificar_oferta(oferta_id=ID)` calcula essa soma).
     2.  **Decida:**
-        - Se o preço for bom (igual ou maior que o preço de tabela), use a ferramenta `aceitar_oferta()`.
-        - Se o preço for muito baixo, use `rejeitar_oferta()`.
-        - Se a oferta for baixa mas negociável, use `fazer_contra_oferta(novo_preco=VALOR)`, propondo um preço mais alto.
+        - Se o preço for bom (igual ou maior que o preço de tabela), use a ferramenta `aceitar_oferta(oferta_id=ID)`.
+        - Se o preço for muito baixo, use `rejeitar_oferta(oferta_id=ID)`.
+        - Se a oferta for baixa mas negociável, use `fazer_contra_oferta(oferta_id=ID, novo_preco=VALOR)`, propondo um preço mais alto.
+        - Se houver VÁRIAS ofertas pendentes, responda todas de uma vez com `responder_ofertas(decisoes=[...])`.
     3.  **Sempre responda usando uma de suas ferramentas.**
     4.  **IMPORTANTE: Sua resposta deve ser EXATAMENTE UMA chamada de ferramenta. Pare imediatamente após a chamada.**
     """
-    empresario_tools = [aceitar_oferta, rejeitar_oferta, fazer_contra_oferta]
-    empresario_agent = criar_agente("Empresario", empresario_prompt, empresario_tools, llm)
-
-    agricultores_agents = {}
-    agricultor_tools = [consultar_inventario, fazer_oferta, plantar_semente]
-
-    for agr_id in agricultores_ids:
-        agricultor_prompt = f"""
-        Você é o Agricultor robô '{agr_id}'. Seu objetivo é plantar em suas parcelas vazias com o maior lucro possível, o que significa comprar insumos pelo menor preço.
-
-        **REGRA DE OURO: Sua resposta DEVE SER SEMPRE uma chamada de ferramenta. NÃO forneça texto conversacional.**
-        **IMPORTANTE: Ao usar qualquer ferramenta, passe seu ID: `(agricultor_id='{agr_id}', ...)`**
-
-        Tabela de preços de referência (use estes IDs nos seus pedidos):
-        - sementes: soja, arroz, hortalica
-        - fertilizantes: fertilizante-comum, fertilizante-premium, fertilizante-super-premium
-        - agrotoxicos: agrotoxico-comum, agrotoxico-premium, agrotoxico-super-premium
-        - maquinas: pacote1, pacote2, pacote3, pulverizador
-
-        Preços:
-        soja: 30, arroz: 20, hortalica: 10
-        fertilizante-comum: 30, fertilizante-premium: 60, fertilizante-super-premium: 90
-        agrotoxico-comum: 30, agrotoxico-premium: 60, agrotoxico-super-premium: 90
-        pacote1: 30, pacote2: 60, pacote3: 90
-        pulverizador: 400
-
-        **ALGORITMO DE NEGOCIAÇÃO E AÇÃO:**
-
-        **1. VERIFICAÇÃO:**
-        - Sua primeira ação de cada turno é `consultar_inventario(agricultor_id='{agr_id}')`.
-
-        **2. PLANEJAMENTO E EXECUÇÃO (UM PASSO DE CADA VEZ):**
-        - Olhe seu inventário. Se precisa de um item para seu plano de plantio, sua próxima ação é fazer uma oferta por ele baseado no preço da tabela se fizer uma oferta muito abaixo o empresario vai recusar tome cuidado.
-        - **Para comprar insumos ou alugar máquinas:** Use `fazer_oferta(agricultor_id='{agr_id}', tipo_item='NOME_DO_ITEM', quantidade=1, preco_proposto=VALOR)`. Proponha um preço um pouco abaixo do valor de mercado para tentar economizar.
-        - **Se o empresário fizer uma contra-oferta:** Analise o novo preço. Se for aceitável, faça uma nova `fazer_oferta` com o preço exato que ele propôs para confirmar a compra.
-        - **Se já tem todos os itens:** Chame `plantar_semente(agricultor_id='{agr_id}', ...)` para concluir seu objetivo, plantando em uma de suas parcelas vazias. Para consultar suas parcelas, use `consultar_inventario(agricultor_id='{agr_id}')` para ver quais estão vazias.
-        """
-        agricultores_agents[agr_id] = criar_agente(f"Agricultor {agr_id}", agricultor_prompt, agricultor_tools, llm)
-
-    return empresario_agent, agricultores_agents
\ No newline at end of file
+EMPRESARIO_TOOLS = [aceitar_oferta, rejeitar_oferta, fazer_contra_oferta, responder_ofertas, precificar_oferta]
+
+# `{agr_id}` é uma variável do template, preenchida por agricultor em AgentesAgricultores.
+PROMPT_AGRICULTOR = TABELA_PRECOS + """
+    Você é o Agricultor robô '{agr_id}'. Seu objetivo é plantar em suas parcelas vazias com o maior lucro possível, o que significa comprar insumos pelo menor preço.
+
+    **REGRA DE OURO: Sua resposta DEVE SER SEMPRE uma chamada de ferramenta. NÃO forneça texto conversacional.**
+    **IMPORTANTE: Ao usar qualquer ferramenta, passe seu ID: `(agricultor_id='{agr_id}', ...)`**
+
+    **ALGORITMO DE NEGOCIAÇÃO E AÇÃO:**
+
+    **1. VERIFICAÇÃO:**
+    - Sua primeira ação de cada turno é `consultar_inventario(agricultor_id='{agr_id}')`.
+
+    **2. PLANEJAMENTO E EXECUÇÃO (UM PASSO DE CADA VEZ):**
+    - Olhe seu inventário. Se faltam itens para seu plano de plantio, sua próxima ação é fazer UMA oferta por TODOS eles, baseada na soma dos preços da tabela; se fizer uma oferta muito abaixo o empresario vai recusar tome cuidado.
+    - **Para comprar insumos ou alugar máquinas:** Use `fazer_oferta_cesta(agricultor_id='{agr_id}', itens=[...], preco_proposto=VALOR)`, em que cada item da lista tem `tipo_item` e `quantidade` (ex.: a semente, o pacote de máquina e, se quiser, fertilizante, agrotóxico e pulverizador). O preço é o total da cesta. Proponha um total um pouco abaixo do valor de mercado para tentar economizar.
+    - Para um único item, também pode usar `fazer_oferta(agricultor_id='{agr_id}', tipo_item='NOME_DO_ITEM', quantidade=1, preco_proposto=VALOR)`.
+    - **Se o empresário fizer uma contra-oferta:** Analise o novo preço. Se for aceitável, refaça a mesma oferta (mesmos itens) com o preço exato que ele propôs para confirmar a compra.
+    - **Se já tem todos os itens:** Chame `plantar_semente(agricultor_id='{agr_id}', ...)` para concluir seu objetivo, plantando em uma de suas parcelas vazias. Para consultar suas parcelas, use `consultar_inventario(agricultor_id='{agr_id}')` para ver quais estão vazias.
+    """
+AGRICULTOR_TOOLS = [consultar_inventario, fazer_oferta, fazer_oferta_cesta, plantar_semente]
+
+
+def _modelo(llm: ChatOpenAI, streaming: bool, limite_raciocinio: int = None):
+    if not streaming: return llm
+    # O cache passa para o envoltório: é ele que vê a resposta final (já cortada).
+    return ModeloStreaming(modelo=llm.model_copy(update={"cache": None}), cache=llm.cache,
+                           limite_raciocinio=limite_raciocinio)
+
+
+def _prompt(role_prompt: str) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
+        [("system", role_prompt), MessagesPlaceholder(variable_name="chat_history", optional=True), ("user", "{input}"),
+         MessagesPlaceholder(variable_name="agent_scratchpad"), ])
+
+
+def _executor(prompt: ChatPromptTemplate, tools: list, llm, verbose: bool) -> AgentExecutor:
+    agent = create_tool_calling_agent(llm, tools, prompt)
+    # Sem stream_runnable o executor chama o modelo por invoke, que consulta o cache do LLM (o stream não consulta).
+    return AgentExecutor(agent=agent, tools=tools, verbose=verbose, handle_parsing_errors=True, stream_runnable=False)
+
+
+def criar_agente(nome_agente: str, role_prompt: str, tools: list, llm: ChatOpenAI, verbose: bool = False,
+                 streaming: bool = False, limite_raciocinio: int = None):
+    """
+    Com `streaming`, o agente consome a resposta do modelo incrementalmente e para na primeira chamada de
+    ferramenta completa (ver ModeloStreaming); `limite_raciocinio` limita os tokens de <think> por chamada.
+    """
+    return _executor(_prompt(role_prompt), tools, _modelo(llm, streaming, limite_raciocinio), verbose)
+
+
+class AgentesAgricultores(Mapping):
+    """
+    agricultor_id -> AgentExecutor do agricultor. Todos compartilham um único template (PROMPT_AGRICULTOR,
+    com o id como variável); o executor de cada agricultor só é criado no primeiro turno dele e fica em um
+    cache LRU de até `max_executores` entradas.
+    """
+    def __init__(self, agricultores_ids: list, llm, verbose: bool = False,
+                 max_executores: int = MAX_EXECUTORES_AGRICULTORES):
+        self._ids = list(agricultores_ids)
+        self._conhecidos = set(self._ids)
+        self._llm = llm
+        self._verbose = verbose
+        self._prompt = _prompt(PROMPT_AGRICULTOR)
+        self.max_executores = max_executores
+        self.criados = 0
+        self._executores = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __getitem__(self, agr_id):
+        if agr_id not in self._conhecidos: raise KeyError(agr_id)
+        with self._trava:
+            executor = self._executores.get(agr_id)
+            if executor is not None:
+                self._executores.move_to_end(agr_id)
+                return executor
+        executor = _executor(self._prompt.partial(agr_id=agr_id), AGRICULTOR_TOOLS, self._llm, self._verbose)
+        with self._trava:
+            self._executores[agr_id] = executor
+            self.criados += 1
+            while len(self._executores) > self.max_executores: self._executores.popitem(last=False)
+        return executor
+
+    def __contains__(self, agr_id):
+        return agr_id in self._conhecidos
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+def inicializar_agentes(llm: ChatOpenAI, agricultores_ids: list, verbose: bool = False, streaming: bool = False,
+                        limite_raciocinio: int = None, max_executores: int = MAX_EXECUTORES_AGRICULTORES):
+    """Inicializa o agente do Empresário; os dos agricultores são criados sob demanda (ver AgentesAgricultores)."""
+    llm = _modelo(llm, streaming, limite_raciocinio)
+    empresario_agent = _executor(_prompt(PROMPT_EMPRESARIO), EMPRESARIO_TOOLS, llm, verbose)
+    return empresario_agent, AgentesAgricultores(agricultores_ids, llm, verbose, max_executores)
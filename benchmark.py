@@ -0,0 +1,244 @@
+# benchmark.py
+
+"""
+Benchmark offline da orquestração: roda o StateGraph real de simulacao.py com um modelo de chat falso,
+determinístico, que segue políticas roteirizadas de agricultor e empresário. Não precisa do LM Studio.
+
+Uso: python benchmark.py --tamanhos 2 20 200 2000
+"""
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from cache_llm import CacheRespostasLLM, MODO_GRAVAR, MODO_REPRODUZIR
+from estado import OFERTA_PENDENTE, OFERTA_CONTRAPROPOSTA, itens_da_oferta
+from estado_compacto import SimulacaoEstadoCompacto
+from ferramentas import preco_de_tabela, valor_de_tabela
+from instrumentacao import coletor
+from politica import PoliticaEmpresario
+from pydantic import PrivateAttr
+from typing import Any
+import argparse
+import asyncio
+import contextlib
+import itertools
+import os
+import json
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import simulacao
+
+SEMENTE = "hortalica"
+PACOTE = "pacote1"
+_ID_AGRICULTOR = re.compile(r"Agricultor robô '([^']+)'")
+_ID_OFERTA = re.compile(r"- (OF\d+):")
+
+
+class ModeloRoteirizado(BaseChatModel):
+    """
+    Modelo de chat falso que chama ferramentas seguindo um roteiro fixo, decidido a partir do estado real.
+    Agricultor: consulta o inventário, oferta `desconto` x tabela pela semente e pelo pacote (juntos em uma
+    cesta, ou um por vez com `cesta=False`), aceita contrapropostas e planta. Empresário: aceita a partir de
+    `limite_aceite` x tabela, senão contrapropõe a tabela. Com `bloqueado`, toda geração falha, como um
+    servidor fora do ar: as respostas só podem vir do cache.
+    """
+    estado: Any = None
+    desconto: float = 0.8
+    limite_aceite: float = 0.9
+    cesta: bool = True
+    bloqueado: bool = False
+    _contador_chamadas: Any = PrivateAttr(default_factory=itertools.count)
+
+    @property
+    def _llm_type(self) -> str:
+        return "roteirizado"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _chamada(self, nome: str, **args) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": nome, "args": args,
+                                                  "id": f"call_{next(self._contador_chamadas)}"}])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.bloqueado: raise ConnectionError("Modelo bloqueado: a resposta deveria ter vindo do cache.")
+        ultima_entrada = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        ferramentas_no_turno = [m for m in messages[ultima_entrada:] if isinstance(m, ToolMessage)]
+        match = _ID_AGRICULTOR.search(messages[0].content)
+        if match:
+            resposta = self._agricultor(match.group(1), len(ferramentas_no_turno))
+        elif ferramentas_no_turno:
+            resposta = AIMessage(content="Ofertas respondidas.")
+        else:
+            resposta = self._empresario(messages[ultima_entrada].content)
+        return ChatResult(generations=[ChatGeneration(message=resposta)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Como o ChatOpenAI, tem um caminho de streaming próprio, que não passa pelo cache do LLM.
+        mensagem = self._generate(messages, stop, run_manager, **kwargs).generations[0].message
+        yield ChatGenerationChunk(message=AIMessageChunk(content=mensagem.content, tool_call_chunks=[
+            {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+            for i, tc in enumerate(mensagem.tool_calls)]))
+
+    def _agricultor(self, agr_id: str, ferramentas_no_turno: int) -> AIMessage:
+        if ferramentas_no_turno == 0: return self._chamada("consultar_inventario", agricultor_id=agr_id)
+        if ferramentas_no_turno > 1: return AIMessage(content="Aguardando o empresário.")
+
+        aberta = self.estado.oferta_aberta_de(agr_id)
+        if aberta and aberta["status"] == OFERTA_CONTRAPROPOSTA:
+            itens = itens_da_oferta(aberta)
+            if len(itens) > 1:
+                return self._chamada("fazer_oferta_cesta", agricultor_id=agr_id, preco_proposto=aberta["preco_proposto"],
+                                     itens=[{"tipo_item": i["item"], "quantidade": i["quantidade"]} for i in itens])
+            return self._chamada("fazer_oferta", agricultor_id=agr_id, tipo_item=aberta["item"],
+                                 quantidade=aberta["quantidade"], preco_proposto=aberta["preco_proposto"])
+        if aberta: return AIMessage(content="Aguardando o empresário.")
+
+        info = self.estado.agricultores[agr_id]
+        vazias = [p for p, cultura in info["parcelas"].items() if cultura is None]
+        if not vazias: return AIMessage(content="Todas as parcelas estão plantadas.")
+        faltando = [item for categoria, item in (("semente", SEMENTE), ("maquina_alugada", PACOTE))
+                    if item not in info["inventario"][categoria]]
+        if len(faltando) > 1 and self.cesta:
+            return self._chamada("fazer_oferta_cesta", agricultor_id=agr_id,
+                                 itens=[{"tipo_item": item, "quantidade": 1} for item in faltando],
+                                 preco_proposto=round(self.desconto * sum(map(preco_de_tabela, faltando)), 2))
+        if faltando:
+            return self._chamada("fazer_oferta", agricultor_id=agr_id, tipo_item=faltando[0], quantidade=1,
+                                 preco_proposto=round(self.desconto * preco_de_tabela(faltando[0]), 2))
+        return self._chamada("plantar_semente", agricultor_id=agr_id, parcela_id=vazias[0], tipo_semente=SEMENTE,
+                             pacote_maquina=PACOTE)
+
+    def _empresario(self, entrada: str) -> AIMessage:
+        decisoes = []
+        for oferta_id in _ID_OFERTA.findall(entrada):
+            oferta = self.estado.livro_ofertas.get(oferta_id)
+            if not oferta or oferta["status"] != OFERTA_PENDENTE: continue
+            referencia = valor_de_tabela(oferta)
+            if oferta["preco_proposto"] >= self.limite_aceite * referencia:
+                decisoes.append({"oferta_id": oferta_id, "acao": "aceitar"})
+            else:
+                decisoes.append({"oferta_id": oferta_id, "acao": "contra_oferta", "novo_preco": referencia})
+        if not decisoes: return AIMessage(content="Nenhuma oferta pendente.")
+        if len(decisoes) > 1: return self._chamada("responder_ofertas", decisoes=decisoes)
+        if decisoes[0]["acao"] == "aceitar": return self._chamada("aceitar_oferta", oferta_id=decisoes[0]["oferta_id"])
+        return self._chamada("fazer_contra_oferta", oferta_id=decisoes[0]["oferta_id"],
+                             novo_preco=decisoes[0]["novo_preco"])
+
+
+def _config_agricultores(n: int) -> dict:
+    return {f"Agr{i + 1}": {"dinheiro": 1000.0, "parcelas": ["P1"]} for i in range(n)}
+
+
+def executar_cenario(n_agricultores: int, concorrente: bool = False, medir_memoria: bool = True,
+                     compacto: bool = False, cesta: bool = True, modelo: ModeloRoteirizado = None) -> dict:
+    modelo = modelo or ModeloRoteirizado(cesta=cesta)
+    coletor.reiniciar()
+    politica = PoliticaEmpresario()
+
+    if medir_memoria: tracemalloc.start()
+    inicio = time.perf_counter()
+    config = _config_agricultores(n_agricultores)
+    estado = SimulacaoEstadoCompacto(10000.0, config) if compacto else None
+    est = simulacao.inicializar_simulacao(config, politica=politica, modelo=modelo, estado=estado)
+    modelo.estado = est
+    duracao_inicializacao = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    # A saída de console da simulação é descartada para não misturar com o relatório.
+    with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+        if concorrente:
+            asyncio.run(simulacao.executar_simulacao_concorrente(est, simulacao.MAX_NEGOCIACOES_CONCORRENTES))
+        else:
+            simulacao.executar_simulacao(est)
+    duracao = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1] if medir_memoria else 0
+    if medir_memoria: tracemalloc.stop()
+
+    relatorio = coletor.relatorio()
+    passos = sum(m["chamadas"] for m in relatorio["metricas"] if m["categoria"] == "no")
+    ferramentas = sum(m["chamadas"] for m in relatorio["metricas"] if m["categoria"] == "ferramenta")
+    # O fim da temporada colhe e limpa as parcelas; os plantios ficam no histórico de temporadas.
+    plantadas = sum(t["plantios"] for t in est.historico_temporadas)
+    return {"agricultores": n_agricultores,
+            "modo": "concorrente" if concorrente else "sequencial",
+            "estado": "compacto" if compacto else "dict",
+            "ofertas": "cesta" if cesta else "item a item",
+            "tempo_inicializacao_s": duracao_inicializacao,
+            "tempo_total_s": duracao,
+            "passos_grafo": passos,
+            "passos_por_s": passos / duracao if duracao else 0.0,
+            "chamadas_ferramenta": ferramentas,
+            "ferramentas_por_s": ferramentas / duracao if duracao else 0.0,
+            "tempo_por_negociacao_s": duracao / n_agricultores,
+            "pico_memoria_mb": pico / 2 ** 20,
+            "transacoes": len(est.transacoes_registradas),
+            "ofertas_feitas": len(est.livro_ofertas),
+            "parcelas_plantadas": plantadas,
+            "decisoes_sem_llm": politica.contadores["aceitas"] + politica.contadores["rejeitadas"]}
+
+
+def verificar_cache_reproducao(n_agricultores: int = 2) -> str:
+    """
+    Confere, sem servidor, que as chamadas dos agentes passam pelo cache do LLM: grava uma execução em um
+    cache temporário e a repete em modo reproduzir com o modelo bloqueado. Uma chamada que escape do cache
+    falha com ConnectionError; uma resposta que não foi gravada, com RespostaNaoGravada.
+    """
+    campos = ("transacoes", "ofertas_feitas", "parcelas_plantadas", "chamadas_ferramenta")
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "cache_llm.sqlite")
+        gravacao = CacheRespostasLLM(caminho, MODO_GRAVAR)
+        gravado = executar_cenario(n_agricultores, medir_memoria=False, modelo=ModeloRoteirizado(cache=gravacao))
+        reproducao = CacheRespostasLLM(caminho, MODO_REPRODUZIR)
+        reproduzido = executar_cenario(n_agricultores, medir_memoria=False,
+                                       modelo=ModeloRoteirizado(cache=reproducao, bloqueado=True))
+    if not gravacao.faltas or gravacao.acertos:
+        raise RuntimeError(f"O modo gravar não gravou as respostas ({gravacao.resumo()}).")
+    diferentes = [c for c in campos if gravado[c] != reproduzido[c]]
+    if diferentes: raise RuntimeError(f"A reprodução divergiu da gravação em: {', '.join(diferentes)}.")
+    return f"Cache do LLM OK: {gravacao.faltas} respostas gravadas e reproduzidas sem chamar o modelo."
+
+
+def _tabela(resultados: list) -> str:
+    cabecalho = f"{'agric.':>7}{'modo':>13}{'total(s)':>10}{'passos':>9}{'passos/s':>10}{'ferr.':>8}" \
+                f"{'ferr./s':>9}{'s/negoc.':>10}{'pico(MB)':>10}{'plantadas':>11}"
+    linhas = [cabecalho, "-" * len(cabecalho)]
+    for r in resultados:
+        linhas.append(f"{r['agricultores']:>7}{r['modo']:>13}{r['tempo_total_s']:>10.2f}{r['passos_grafo']:>9}"
+                      f"{r['passos_por_s']:>10.1f}{r['chamadas_ferramenta']:>8}{r['ferramentas_por_s']:>9.1f}"
+                      f"{r['tempo_por_negociacao_s']:>10.4f}{r['pico_memoria_mb']:>10.1f}{r['parcelas_plantadas']:>11}")
+    return "\n".join(linhas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark offline da orquestração da simulação.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[2, 20, 200, 2000],
+                        help="Números de agricultores a simular.")
+    parser.add_argument("--concorrente", action="store_true", help="Usa o grafo concorrente.")
+    parser.add_argument("--sem-memoria", action="store_true",
+                        help="Não mede o pico de memória (tracemalloc deixa a execução mais lenta).")
+    parser.add_argument("--estado-compacto", action="store_true", help="Usa o SimulacaoEstadoCompacto.")
+    parser.add_argument("--sem-cesta", action="store_true",
+                        help="O agricultor roteirizado negocia um item por oferta, em vez de uma cesta por parcela.")
+    parser.add_argument("--verificar-cache", action="store_true",
+                        help="Só confere, sem servidor, que as chamadas dos agentes são gravadas e reproduzidas pelo cache.")
+    parser.add_argument("--saida", default=None, help="Grava os resultados em JSON neste arquivo.")
+    args = parser.parse_args()
+    if args.verificar_cache:
+        print(verificar_cache_reproducao())
+        sys.exit(0)
+
+    resultados = []
+    for n in args.tamanhos:
+        resultados.append(executar_cenario(n, args.concorrente, not args.sem_memoria, args.estado_compacto,
+                                           not args.sem_cesta))
+        print(f"Cenário com {n} agricultores concluído em {resultados[-1]['tempo_total_s']:.2f}s")
+    print()
+    print(_tabela(resultados))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados salvos em '{args.saida}'")
@@ -0,0 +1,102 @@
+# cache_llm.py
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+MODO_GRAVAR = "gravar"          # consulta o cache e grava as respostas novas
+MODO_REPRODUZIR = "reproduzir"  # só consulta o cache; falha se a resposta não estiver gravada
+MODO_DIRETO = "direto"          # ignora o cache e sempre chama o LLM
+MODOS = (MODO_GRAVAR, MODO_REPRODUZIR, MODO_DIRETO)
+
+
+class RespostaNaoGravada(RuntimeError):
+    pass
+
+
+def _sem_uso_de_tokens(prompt: str) -> str:
+    """
+    Tira o `usage_metadata` das mensagens do prompt. O LangChain o altera nas respostas vindas do cache
+    (total_cost=0) e elas voltam ao prompt das chamadas seguintes do agente, o que mudaria a chave.
+    """
+    try:
+        mensagens = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(mensagens, list): return prompt
+    for m in mensagens:
+        if isinstance(m, dict) and isinstance(m.get("kwargs"), dict): m["kwargs"].pop("usage_metadata", None)
+    # Sempre serializado de novo, para a gravação e a reprodução produzirem o mesmo texto.
+    return json.dumps(mensagens)
+
+
+class CacheRespostasLLM(BaseCache):
+    """
+    Cache persistente (SQLite) de respostas do LLM, plugado via `ChatOpenAI(cache=...)`.
+    A chave é o hash do `llm_string` do LangChain (modelo, parâmetros e esquema das ferramentas)
+    junto com as mensagens do prompt. Quando passa de `max_entradas`, remove as menos usadas (LRU).
+    """
+    def __init__(self, caminho: str = "cache_llm.sqlite", modo: str = MODO_GRAVAR, max_entradas: int = 50000):
+        if modo not in MODOS: raise ValueError(f"Modo de cache inválido: '{modo}'. Use um de {MODOS}.")
+        self.modo = modo
+        self.max_entradas = max_entradas
+        self.acertos = 0
+        self.faltas = 0
+        self._trava = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS respostas (chave TEXT PRIMARY KEY, resposta TEXT NOT NULL, "
+            "ultimo_acesso REAL NOT NULL)")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acesso ON respostas (ultimo_acesso)")
+        self._conexao.commit()
+        self._total = self._conexao.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+
+    @staticmethod
+    def _chave(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{_sem_uso_de_tokens(prompt)}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        if self.modo == MODO_DIRETO: return None
+        chave = self._chave(prompt, llm_string)
+        with self._trava:
+            linha = self._conexao.execute("SELECT resposta FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if linha:
+                self._conexao.execute("UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (time.time(), chave))
+                self._conexao.commit()
+        if linha:
+            self.acertos += 1
+            return loads(linha[0])
+        self.faltas += 1
+        if self.modo == MODO_REPRODUZIR:
+            raise RespostaNaoGravada(f"Resposta não encontrada no cache (chave {chave[:12]}) em modo '{MODO_REPRODUZIR}'.")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        if self.modo != MODO_GRAVAR: return
+        chave = self._chave(prompt, llm_string)
+        with self._trava:
+            cursor = self._conexao.execute(
+                "INSERT OR IGNORE INTO respostas (chave, resposta, ultimo_acesso) VALUES (?, ?, ?)",
+                (chave, dumps(return_val), time.time()))
+            self._total += cursor.rowcount
+            if self._total > self.max_entradas: self._remover_excedentes()
+            self._conexao.commit()
+
+    def _remover_excedentes(self):
+        self._conexao.execute(
+            "DELETE FROM respostas WHERE chave IN "
+            "(SELECT chave FROM respostas ORDER BY ultimo_acesso ASC LIMIT ?)", (self._total - self.max_entradas,))
+        self._total = self.max_entradas
+
+    def clear(self, **kwargs) -> None:
+        with self._trava:
+            self._conexao.execute("DELETE FROM respostas")
+            self._conexao.commit()
+            self._total = 0
+
+    def resumo(self) -> str:
+        return f"Cache do LLM ({self.modo}): {self.acertos} acertos, {self.faltas} faltas"
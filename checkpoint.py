@@ -0,0 +1,194 @@
+# checkpoint.py
+
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from estado import SimulacaoEstado
+from livro_transacoes import LivroTransacoes
+import json
+import sqlite3
+import time
+
+# Campos do GraphState salvos junto com cada checkpoint (o SimulacaoEstado é salvo à parte, por deltas).
+CAMPOS_GRAFO = ("next_agricultor_idx", "current_agricultor_id", "next_action", "iteracoes_negociacao", "n_temporadas")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    execucao_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origem_execucao INTEGER, origem_passo INTEGER, ordem_agricultores TEXT, criada_em REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    execucao_id INTEGER NOT NULL, passo INTEGER NOT NULL, no TEXT, grafo TEXT NOT NULL,
+    dinheiro_empresario REAL NOT NULL, proximo_id_oferta INTEGER NOT NULL, temporada_atual INTEGER NOT NULL,
+    agregados_temporada TEXT NOT NULL, criado_em REAL NOT NULL,
+    PRIMARY KEY (execucao_id, passo));
+CREATE TABLE IF NOT EXISTS agricultores (
+    execucao_id INTEGER NOT NULL, passo INTEGER NOT NULL, agricultor_id TEXT NOT NULL, dados TEXT NOT NULL,
+    PRIMARY KEY (execucao_id, agricultor_id, passo));
+CREATE TABLE IF NOT EXISTS ofertas (
+    execucao_id INTEGER NOT NULL, passo INTEGER NOT NULL, oferta_id TEXT NOT NULL, dados TEXT NOT NULL,
+    PRIMARY KEY (execucao_id, oferta_id, passo));
+CREATE TABLE IF NOT EXISTS transacoes (
+    execucao_id INTEGER NOT NULL, passo INTEGER NOT NULL, seq INTEGER NOT NULL, dados TEXT NOT NULL,
+    PRIMARY KEY (execucao_id, seq));
+CREATE TABLE IF NOT EXISTS plantios (
+    execucao_id INTEGER NOT NULL, passo INTEGER NOT NULL, temporada INTEGER NOT NULL, seq INTEGER NOT NULL,
+    dados TEXT NOT NULL, PRIMARY KEY (execucao_id, temporada, seq));
+CREATE TABLE IF NOT EXISTS temporadas (
+    execucao_id INTEGER NOT NULL, passo INTEGER NOT NULL, numero INTEGER NOT NULL, dados TEXT NOT NULL,
+    PRIMARY KEY (execucao_id, numero));
+"""
+
+
+class ArmazemCheckpoints:
+    """
+    Checkpoints incrementais da simulação em SQLite. Cada passo grava o GraphState (mensagens e contadores),
+    mas do SimulacaoEstado só grava os agricultores e ofertas que mudaram (segundo o diário de alterações
+    do estado, sem comparar o estado inteiro) e as transações, plantios e temporadas encerradas novos.
+    Para restaurar um passo, pega a última versão de cada agricultor/oferta até aquele passo.
+    Uma execução retomada (ou bifurcada) ganha um novo id; seu primeiro checkpoint é completo.
+    """
+    def __init__(self, caminho: str = "simulacao_checkpoints.sqlite"):
+        self._conexao = sqlite3.connect(caminho)
+        self._conexao.executescript(_ESQUEMA)
+        self.execucao_id = None
+        self.ultimo_passo = None
+        self._estado_observado = None
+        self._alteracoes = None
+        self._transacoes_salvas = 0
+        self._plantios_salvos = (None, 0)
+        self._temporadas_salvas = 0
+        self._ordem_salva = False
+
+    def nova_execucao(self, origem: tuple = None) -> int:
+        origem_execucao, origem_passo = origem or (None, None)
+        cursor = self._conexao.execute(
+            "INSERT INTO execucoes (origem_execucao, origem_passo, criada_em) VALUES (?, ?, ?)",
+            (origem_execucao, origem_passo, time.time()))
+        self._conexao.commit()
+        self.execucao_id = cursor.lastrowid
+        self._parar_de_observar()
+        self._transacoes_salvas = 0
+        self._plantios_salvos, self._temporadas_salvas = (None, 0), 0
+        self._ordem_salva = False
+        return self.execucao_id
+
+    def _parar_de_observar(self):
+        if self._estado_observado is not None: self._estado_observado.deixar_de_observar(self._alteracoes)
+        self._estado_observado, self._alteracoes = None, None
+
+    def _alterados(self, estado: SimulacaoEstado) -> tuple:
+        """Agricultores e ofertas a gravar: todos no primeiro checkpoint do estado, depois só os alterados."""
+        if estado is not self._estado_observado:
+            self._parar_de_observar()
+            self._estado_observado, self._alteracoes = estado, estado.observar()
+            return list(estado.agricultores), list(estado.livro_ofertas)
+        alteracoes = self._alteracoes.consumir()
+        return list(alteracoes.agricultores), sorted(alteracoes.ofertas, key=lambda i: int(i[2:]))
+
+    def salvar(self, passo: int, no: str, grafo: dict):
+        estado: SimulacaoEstado = grafo["simulacao_estado"]
+        dados_grafo = {campo: grafo.get(campo) for campo in CAMPOS_GRAFO}
+        dados_grafo["messages"] = messages_to_dict(grafo.get("messages") or [])
+
+        agr_ids, oferta_ids = self._alterados(estado)
+        agricultores = [(self.execucao_id, passo, agr_id,
+                         json.dumps(estado.agricultor_como_dict(agr_id), ensure_ascii=False)) for agr_id in agr_ids]
+        ofertas = [(self.execucao_id, passo, oferta_id, json.dumps(estado.livro_ofertas[oferta_id], ensure_ascii=False))
+                   for oferta_id in oferta_ids]
+
+        if not self._ordem_salva:
+            # Primeiro checkpoint da execução: guarda a ordem dos agricultores, usada por next_agricultor_idx.
+            self._ordem_salva = True
+            self._conexao.execute("UPDATE execucoes SET ordem_agricultores = ? WHERE execucao_id = ?",
+                                  (json.dumps(list(estado.agricultores)), self.execucao_id))
+
+        novas = estado.transacoes_registradas[self._transacoes_salvas:]
+        transacoes = [(self.execucao_id, passo, self._transacoes_salvas + i, json.dumps(t, ensure_ascii=False))
+                      for i, t in enumerate(novas)]
+        self._transacoes_salvas += len(novas)
+
+        temporada_salva, ja_salvos = self._plantios_salvos
+        if temporada_salva != estado.temporada_atual: ja_salvos = 0
+        plantios = [(self.execucao_id, passo, estado.temporada_atual, ja_salvos + i, json.dumps(p))
+                    for i, p in enumerate(estado.plantios_temporada[ja_salvos:])]
+        self._plantios_salvos = (estado.temporada_atual, ja_salvos + len(plantios))
+
+        temporadas = [(self.execucao_id, passo, t["temporada"], json.dumps(t, ensure_ascii=False))
+                      for t in estado.historico_temporadas[self._temporadas_salvas:]]
+        self._temporadas_salvas += len(temporadas)
+
+        with self._conexao:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.execucao_id, passo, no, json.dumps(dados_grafo, ensure_ascii=False),
+                 estado.dinheiro_empresario, estado._proximo_id_oferta, estado.temporada_atual,
+                 json.dumps(estado.agregados_temporada), time.time()))
+            self._conexao.executemany("INSERT OR REPLACE INTO agricultores VALUES (?, ?, ?, ?)", agricultores)
+            self._conexao.executemany("INSERT OR REPLACE INTO ofertas VALUES (?, ?, ?, ?)", ofertas)
+            self._conexao.executemany("INSERT OR REPLACE INTO transacoes VALUES (?, ?, ?, ?)", transacoes)
+            self._conexao.executemany("INSERT OR REPLACE INTO plantios VALUES (?, ?, ?, ?, ?)", plantios)
+            self._conexao.executemany("INSERT OR REPLACE INTO temporadas VALUES (?, ?, ?, ?)", temporadas)
+        self.ultimo_passo = passo
+
+    def localizar(self, referencia: str) -> tuple:
+        """Converte 'ultimo', 'EXEC' ou 'EXEC:PASSO' em (execucao_id, passo)."""
+        if referencia == "ultimo":
+            linha = self._conexao.execute(
+                "SELECT execucao_id, passo FROM checkpoints ORDER BY criado_em DESC LIMIT 1").fetchone()
+        elif ":" in referencia:
+            execucao, passo = referencia.split(":", 1)
+            linha = self._conexao.execute("SELECT execucao_id, passo FROM checkpoints WHERE execucao_id = ? AND passo = ?",
+                                          (int(execucao), int(passo))).fetchone()
+        else:
+            linha = self._conexao.execute(
+                "SELECT execucao_id, MAX(passo) FROM checkpoints WHERE execucao_id = ? GROUP BY execucao_id",
+                (int(referencia),)).fetchone()
+        if not linha: raise ValueError(f"Checkpoint '{referencia}' não encontrado.")
+        return linha
+
+    def _consultar_json(self, sql: str, parametros: tuple) -> list:
+        return [json.loads(dados) for (dados,) in self._conexao.execute(sql, parametros)]
+
+    def _ultimas_versoes(self, tabela: str, chave: str, execucao_id: int, passo: int) -> dict:
+        linhas = self._conexao.execute(
+            f"SELECT t.{chave}, t.dados FROM {tabela} t JOIN "
+            f"(SELECT {chave}, MAX(passo) AS passo FROM {tabela} WHERE execucao_id = ? AND passo <= ? GROUP BY {chave}) u "
+            f"ON t.{chave} = u.{chave} AND t.passo = u.passo WHERE t.execucao_id = ?",
+            (execucao_id, passo, execucao_id)).fetchall()
+        return {k: json.loads(dados) for k, dados in linhas}
+
+    def carregar(self, execucao_id: int, passo: int, livro_transacoes: LivroTransacoes = None) -> dict:
+        """
+        Devolve o GraphState do checkpoint, com o SimulacaoEstado reconstruído e o nó que o gravou em
+        `ultimo_no`. As transações são recarregadas em `livro_transacoes` (por exemplo, um livro que grava
+        segmentos em disco).
+        """
+        linha = self._conexao.execute(
+            "SELECT no, grafo, dinheiro_empresario, proximo_id_oferta, temporada_atual, agregados_temporada "
+            "FROM checkpoints WHERE execucao_id = ? AND passo = ?", (execucao_id, passo)).fetchone()
+        if not linha: raise ValueError(f"Checkpoint {execucao_id}:{passo} não encontrado.")
+        no, grafo, dinheiro_empresario, proximo_id_oferta, temporada_atual, agregados = linha
+        ordem = json.loads(self._conexao.execute("SELECT ordem_agricultores FROM execucoes WHERE execucao_id = ?",
+                                                 (execucao_id,)).fetchone()[0])
+        agricultores = self._ultimas_versoes("agricultores", "agricultor_id", execucao_id, passo)
+
+        transacoes = self._consultar_json(
+            "SELECT dados FROM transacoes WHERE execucao_id = ? AND passo <= ? ORDER BY seq", (execucao_id, passo))
+        ofertas = self._ultimas_versoes("ofertas", "oferta_id", execucao_id, passo)
+        estado = SimulacaoEstado.restaurar(dinheiro_empresario, {agr_id: agricultores[agr_id] for agr_id in ordem},
+                                           dict(sorted(ofertas.items(), key=lambda item: int(item[0][2:]))),
+                                           transacoes, proximo_id_oferta, temporada_atual, json.loads(agregados),
+                                           self._consultar_json(
+                                               "SELECT dados FROM plantios WHERE execucao_id = ? AND passo <= ? "
+                                               "AND temporada = ? ORDER BY seq", (execucao_id, passo, temporada_atual)),
+                                           self._consultar_json(
+                                               "SELECT dados FROM temporadas WHERE execucao_id = ? AND passo <= ? "
+                                               "ORDER BY numero", (execucao_id, passo)),
+                                           livro_transacoes, passo)
+        dados_grafo = json.loads(grafo)
+        dados_grafo["messages"] = messages_from_dict(dados_grafo["messages"])
+        dados_grafo["simulacao_estado"] = estado
+        dados_grafo["ultimo_no"] = no
+        return dados_grafo
+
+    def fechar(self):
+        self._parar_de_observar()
+        self._conexao.close()
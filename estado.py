@@ -1,30 +1,272 @@
 # estado.py
 
+from livro_transacoes import LivroTransacoes
+import copy
+import threading
+
+
+# Ciclo de vida de uma oferta no livro de ofertas.
+OFERTA_PENDENTE = "pendente"              # aguardando resposta do empresário
+OFERTA_CONTRAPROPOSTA = "contraproposta"  # aguardando resposta do agricultor
+OFERTA_ACEITA = "aceita"
+OFERTA_REJEITADA = "rejeitada"
+OFERTA_SUBSTITUIDA = "substituida"        # o agricultor fez uma nova oferta no lugar desta
+OFERTA_FALHOU = "falhou"                  # aceita, mas a liquidação não foi possível
+ESTADOS_ABERTOS = (OFERTA_PENDENTE, OFERTA_CONTRAPROPOSTA)
+CATEGORIAS_INVENTARIO = ("semente", "fertilizante", "agrotoxico", "maquina_alugada")
+ITEM_CESTA = "cesta"  # valor de "item" nas ofertas com vários itens (a lista completa fica em "itens")
+
+
+class Alteracoes:
+    """
+    Diário de alterações de um observador do estado (ver SimulacaoEstado.observar): campos alterados por
+    agricultor, ofertas alteradas e se o caixa do empresário mudou desde o último `consumir()`.
+    """
+    def __init__(self):
+        self.agricultores = {}
+        self.ofertas = set()
+        self.empresario = False
+        self._trava = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.agricultores or self.ofertas or self.empresario)
+
+    def consumir(self) -> "Alteracoes":
+        """Devolve o que foi acumulado até aqui e recomeça o diário vazio."""
+        copia = Alteracoes()
+        with self._trava:
+            copia.agricultores, self.agricultores = self.agricultores, {}
+            copia.ofertas, self.ofertas = self.ofertas, set()
+            copia.empresario, self.empresario = self.empresario, False
+        return copia
+
+
+def _agregados_vazios() -> dict:
+    return {"transacoes": 0, "receita_empresario": 0.0, "plantios": 0, "produtividade": 0.0, "poluicao": 0}
+
+
+def itens_da_oferta(oferta: dict) -> list:
+    """Itens da oferta como [{"item", "quantidade"}]; ofertas antigas (sem "itens") têm um só item."""
+    return oferta.get("itens") or [{"item": oferta["item"], "quantidade": oferta["quantidade"]}]
+
+
+def descrever_itens(oferta: dict) -> str:
+    descricao = " + ".join(f"{i['quantidade']} x '{i['item']}'" for i in itens_da_oferta(oferta))
+    return f"cesta [{descricao}]" if oferta["item"] == ITEM_CESTA else descricao
+
+
 class SimulacaoEstado:
     """
     Define o estado global da simulação, modelado a partir dos conceitos do Jogo Gorim.
     """
-    def __init__(self, dinheiro_empresario_inicial: float, agricultores_info: dict):
+    def __init__(self, dinheiro_empresario_inicial: float, agricultores_info: dict,
+                 livro_transacoes: LivroTransacoes = None):
         self.dinheiro_empresario = dinheiro_empresario_inicial
         self.agricultores = {}
         for agr_id, info in agricultores_info.items():
             self.agricultores[agr_id] = {
                 "dinheiro": info.get("dinheiro", 0.0),
-                "inventario": {"semente": [], "fertilizante": [], "agrotoxico": [], "maquina_alugada": []},
+                "inventario": {categoria: [] for categoria in CATEGORIAS_INVENTARIO},
                 "parcelas": {parcela_id: None for parcela_id in info.get("parcelas", [])},
                 "produtividade_total": 0.0,
                 "poluicao_gerada": 0
             }
-        self.transacoes_registradas = []
+        self.transacoes_registradas = livro_transacoes if livro_transacoes is not None else LivroTransacoes()
+        # Contador de nós executados; carimba as transações para análises ao longo do tempo.
+        self.passo_atual = 0
         self.historico_negociacao = {}
-        self.negociacao_em_andamento = {
-            "oferta_ativa": False,
-            "agricultor_id": None,
-            "item": None,
-            "quantidade": 0,
-            "preco_proposto": 0.0,
-            "ultimo_ofertante": None
-        }
+        # Temporada corrente: agregados mantidos incrementalmente pelas ferramentas, sem varrer as transações.
+        self.temporada_atual = 1
+        self.agregados_temporada = _agregados_vazios()
+        self.plantios_temporada = []
+        self.agricultores_ativos_temporada = set()
+        self.historico_temporadas = []
+        # Livro de ofertas indexado por id; cada agricultor tem no máximo uma oferta aberta.
+        self.livro_ofertas = {}
+        self.oferta_aberta_por_agricultor = {}
+        self._proximo_id_oferta = 1
+        # Protege o dinheiro do empresário, as transações e o livro de ofertas em negociações concorrentes.
+        self.trava = threading.RLock()
+        # Diários de alteração (um por observador), preenchidos pelos métodos que alteram o estado e pelas ferramentas.
+        self._observadores = []
+
+    @classmethod
+    def restaurar(cls, dinheiro_empresario: float, agricultores: dict, ofertas: dict, transacoes: list,
+                  proximo_id_oferta: int, temporada_atual: int = 1, agregados_temporada: dict = None,
+                  plantios_temporada: list = None, historico_temporadas: list = None,
+                  livro_transacoes: LivroTransacoes = None, passo: int = 0) -> "SimulacaoEstado":
+        """Reconstrói o estado a partir de um checkpoint (ver checkpoint.py)."""
+        estado = cls(dinheiro_empresario, {}, livro_transacoes)
+        estado.agricultores = agricultores
+        estado.livro_ofertas = ofertas
+        estado.transacoes_registradas.estender(transacoes)
+        estado.passo_atual = passo
+        estado._proximo_id_oferta = proximo_id_oferta
+        for oferta_id, oferta in ofertas.items():
+            if oferta["status"] in ESTADOS_ABERTOS: estado.oferta_aberta_por_agricultor[oferta["agricultor_id"]] = oferta_id
+        estado.temporada_atual = temporada_atual
+        estado.agregados_temporada = agregados_temporada or _agregados_vazios()
+        estado.plantios_temporada = [tuple(p) for p in plantios_temporada or []]
+        estado.historico_temporadas = historico_temporadas or []
+        estado.agricultores_ativos_temporada = {p[0] for p in estado.plantios_temporada} | \
+            {t["comprador"] for t in transacoes if t.get("temporada") == temporada_atual}
+        return estado
+
+    def __getstate__(self):
+        # A trava não é serializável; é recriada em __setstate__. Os observadores ficam no processo original.
+        dados = self.__dict__.copy()
+        del dados["trava"]
+        dados.pop("_observadores", None)
+        return dados
+
+    def __setstate__(self, dados):
+        self.__dict__.update(dados)
+        self.trava = threading.RLock()
+        self._observadores = []
+
+    def observar(self) -> Alteracoes:
+        """Novo diário de alterações, preenchido daqui em diante (ex.: checkpoints, relatório por passo)."""
+        alteracoes = Alteracoes()
+        self._observadores.append(alteracoes)
+        return alteracoes
+
+    def deixar_de_observar(self, alteracoes: Alteracoes):
+        if alteracoes in self._observadores: self._observadores.remove(alteracoes)
+
+    def marcar(self, agricultor_id: str, *campos: str):
+        for alteracoes in self._observadores:
+            with alteracoes._trava:
+                alteracoes.agricultores.setdefault(agricultor_id, set()).update(campos)
+
+    def marcar_oferta(self, oferta_id: str):
+        for alteracoes in self._observadores:
+            with alteracoes._trava:
+                alteracoes.ofertas.add(oferta_id)
+
+    def marcar_empresario(self):
+        for alteracoes in self._observadores:
+            with alteracoes._trava:
+                alteracoes.empresario = True
+
+    def resumir_alteracoes(self, alteracoes: Alteracoes) -> dict:
+        """
+        Valores atuais só do que mudou: {"agricultores": {id: {campo: valor}}, "ofertas": {id: status}, ...}.
+        Os valores são cópias: o resumo pode ser serializado em segundo plano enquanto a simulação segue.
+        """
+        resumo = {}
+        with self.trava:
+            if alteracoes.agricultores:
+                resumo["agricultores"] = {}
+                for agr_id, campos in alteracoes.agricultores.items():
+                    info = self.agricultor_como_dict(agr_id)
+                    resumo["agricultores"][agr_id] = {campo: copy.deepcopy(info[campo]) for campo in sorted(campos)}
+            if alteracoes.ofertas:
+                resumo["ofertas"] = {oferta_id: self.livro_ofertas[oferta_id]["status"]
+                                     for oferta_id in sorted(alteracoes.ofertas, key=lambda i: int(i[2:]))}
+            if alteracoes.empresario: resumo["dinheiro_empresario"] = self.dinheiro_empresario
+        return resumo
+
+    def possui_item(self, agricultor_id: str, categoria: str, nome_item: str) -> bool:
+        return nome_item in self.agricultores[agricultor_id]["inventario"][categoria]
+
+    def adicionar_item(self, agricultor_id: str, categoria: str, nome_item: str, quantidade: int = 1):
+        self.agricultores[agricultor_id]["inventario"][categoria].extend([nome_item] * quantidade)
+        self.marcar(agricultor_id, "inventario")
+
+    def consumir_item(self, agricultor_id: str, categoria: str, nome_item: str):
+        self.agricultores[agricultor_id]["inventario"][categoria].remove(nome_item)
+        self.marcar(agricultor_id, "inventario")
+
+    def agricultor_como_dict(self, agricultor_id: str) -> dict:
+        """Dados do agricultor como dict puro (serializável em JSON)."""
+        return self.agricultores[agricultor_id]
+
+    def avancar_passo(self):
+        with self.trava:
+            self.passo_atual += 1
+
+    def registrar_transacao(self, transacao: dict):
+        with self.trava:
+            transacao["temporada"] = self.temporada_atual
+            transacao["passo"] = self.passo_atual
+            self.transacoes_registradas.registrar(transacao)
+            self.agregados_temporada["transacoes"] += 1
+            self.agregados_temporada["receita_empresario"] += transacao["preco_total"]
+            self.agricultores_ativos_temporada.add(transacao["comprador"])
+
+    def reservar_transacoes(self, n: int):
+        """Prepara o livro para `n` transações seguidas; é a parte do registro que pode falhar (ex.: disco)."""
+        self.transacoes_registradas.reservar(n)
+
+    def registrar_plantio(self, agricultor_id: str, parcela_id: str, cultura: str, produtividade: float,
+                          poluicao: int):
+        info = self.agricultores[agricultor_id]
+        info["produtividade_total"] += produtividade
+        info["poluicao_gerada"] += poluicao
+        info["parcelas"][parcela_id] = cultura
+        self._acumular_plantio(agricultor_id, parcela_id, produtividade, poluicao)
+
+    def _acumular_plantio(self, agricultor_id: str, parcela_id: str, produtividade: float, poluicao: int):
+        with self.trava:
+            self.plantios_temporada.append((agricultor_id, parcela_id, produtividade, poluicao))
+            self.agregados_temporada["plantios"] += 1
+            self.agregados_temporada["produtividade"] += produtividade
+            self.agregados_temporada["poluicao"] += poluicao
+            self.agricultores_ativos_temporada.add(agricultor_id)
+        self.marcar(agricultor_id, "parcelas", "produtividade_total", "poluicao_gerada")
+
+    def iniciar_temporada(self):
+        self.temporada_atual += 1
+        self.agregados_temporada = _agregados_vazios()
+        self.plantios_temporada = []
+        self.agricultores_ativos_temporada = set()
+
+    def registrar_oferta(self, agricultor_id: str, item: str, quantidade: int, preco_proposto: float,
+                         itens: list = None) -> dict:
+        """`itens` ([{"item", "quantidade"}, ...]) registra uma cesta, negociada e liquidada por um preço único."""
+        itens = itens or [{"item": item, "quantidade": quantidade}]
+        if len(itens) > 1: item, quantidade = ITEM_CESTA, 1
+        elif itens: item, quantidade = itens[0]["item"], itens[0]["quantidade"]
+        with self.trava:
+            anterior = self.oferta_aberta_de(agricultor_id)
+            if anterior:
+                anterior["status"] = OFERTA_SUBSTITUIDA
+                self.marcar_oferta(anterior["oferta_id"])
+            oferta = {
+                "oferta_id": f"OF{self._proximo_id_oferta}",
+                "agricultor_id": agricultor_id,
+                "item": item,
+                "quantidade": quantidade,
+                "itens": itens,
+                "preco_proposto": preco_proposto,
+                "ultimo_ofertante": "Agricultor",
+                "status": OFERTA_PENDENTE
+            }
+            self._proximo_id_oferta += 1
+            self.livro_ofertas[oferta["oferta_id"]] = oferta
+            self.oferta_aberta_por_agricultor[agricultor_id] = oferta["oferta_id"]
+            self.marcar_oferta(oferta["oferta_id"])
+            return oferta
+
+    def oferta_aberta_de(self, agricultor_id: str):
+        oferta = self.livro_ofertas.get(self.oferta_aberta_por_agricultor.get(agricultor_id))
+        if oferta and oferta["status"] in ESTADOS_ABERTOS: return oferta
+        return None
+
+    def ofertas_pendentes(self, agricultor_id: str = None) -> list:
+        """Ofertas aguardando resposta do empresário, opcionalmente de um único agricultor."""
+        ids = [self.oferta_aberta_por_agricultor.get(agricultor_id)] if agricultor_id \
+            else list(self.oferta_aberta_por_agricultor.values())
+        return [self.livro_ofertas[i] for i in ids if i in self.livro_ofertas
+                and self.livro_ofertas[i]["status"] == OFERTA_PENDENTE]
+
+    def encerrar_oferta(self, oferta_id: str, status: str):
+        with self.trava:
+            oferta = self.livro_ofertas[oferta_id]
+            oferta["status"] = status
+            self.marcar_oferta(oferta_id)
+            if self.oferta_aberta_por_agricultor.get(oferta["agricultor_id"]) == oferta_id:
+                del self.oferta_aberta_por_agricultor[oferta["agricultor_id"]]
 
     def __repr__(self):
         status = "\n"
@@ -33,8 +275,12 @@ class SimulacaoEstado:
         status += "================================================\n"
         status += f"\n[EMPRESÁRIO]\n"
         status += f"  - Dinheiro: R${self.dinheiro_empresario:.2f}\n"
-        status += f"\n[NEGOCIAÇÃO EM ANDAMENTO]\n"
-        status += f"  - {self.negociacao_em_andamento}\n"
+        status += f"\n[OFERTAS EM ABERTO]\n"
+        abertas = [self.livro_ofertas[i] for i in self.oferta_aberta_por_agricultor.values()]
+        if not abertas:
+            status += "  Nenhuma oferta em aberto.\n"
+        for oferta in abertas:
+            status += f"  - {oferta}\n"
         status += "\n[AGRICULTORES]\n"
         if not self.agricultores:
             status += "  Nenhum agricultor na simulação.\n"
@@ -47,6 +293,8 @@ class SimulacaoEstado:
                 status += f"    - Produtividade Total: R${info['produtividade_total']:.2f}\n"
                 status += f"    - Poluição Total Gerada: {info['poluicao_gerada']}\n"
         status += f"\n[GERAL]\n"
+        status += f"  - Temporada Atual: {self.temporada_atual} (encerradas: {len(self.historico_temporadas)})\n"
         status += f"  - Total de Transações Registradas: {len(self.transacoes_registradas)}\n"
+        status += f"  - Total de Ofertas no Livro: {len(self.livro_ofertas)}\n"
         status += "================================================\n"
         return status
\ No newline at end of file
@@ -0,0 +1,278 @@
+# estado_compacto.py
+
+from collections.abc import Mapping, MutableMapping
+from estado import SimulacaoEstado, CATEGORIAS_INVENTARIO
+from livro_transacoes import LivroTransacoes
+import numpy as np
+
+_CAMPOS_AGRICULTOR = ("dinheiro", "inventario", "parcelas", "produtividade_total", "poluicao_gerada")
+_COLUNAS_INICIAIS = 16
+
+
+class SimulacaoEstadoCompacto(SimulacaoEstado):
+    """
+    Variante do SimulacaoEstado para milhares de agricultores. Dinheiro, produtividade e poluição ficam em
+    colunas NumPy indexadas pelo número do agricultor; o inventário é uma matriz agricultor x item com a
+    quantidade de cada item, e as parcelas de todos os agricultores ficam em um único array de culturas.
+    `agricultores` continua acessível como dict (visões sobre os arrays), então as ferramentas não mudam.
+    """
+    def __init__(self, dinheiro_empresario_inicial: float, agricultores_info: dict,
+                 livro_transacoes: LivroTransacoes = None):
+        super().__init__(dinheiro_empresario_inicial, {}, livro_transacoes)
+        self._ids = list(agricultores_info)
+        self._indice = {agr_id: i for i, agr_id in enumerate(self._ids)}
+        n = len(self._ids)
+        self.dinheiro = np.array([info.get("dinheiro", 0.0) for info in agricultores_info.values()], dtype=np.float64)
+        self.produtividade_total = np.zeros(n, dtype=np.float64)
+        self.poluicao_gerada = np.zeros(n, dtype=np.int64)
+
+        # Itens são internados sob demanda: coluna -> (categoria, nome).
+        self._itens = []
+        self._coluna_item = {}
+        self._colunas_categoria = {categoria: [] for categoria in CATEGORIAS_INVENTARIO}
+        self.estoque = np.zeros((n, _COLUNAS_INICIAIS), dtype=np.int32)
+
+        # As parcelas do agricultor i ocupam a fatia [_inicio_parcelas[i], _inicio_parcelas[i + 1]).
+        self._nomes_parcelas = []
+        inicio = [0]
+        for info in agricultores_info.values():
+            self._nomes_parcelas.extend(info.get("parcelas", []))
+            inicio.append(len(self._nomes_parcelas))
+        self._inicio_parcelas = np.array(inicio, dtype=np.int64)
+        self._culturas = []
+        self._codigo_cultura = {}
+        self.cultura_parcela = np.full(len(self._nomes_parcelas), -1, dtype=np.int16)
+        self.agricultores = _VisaoAgricultores(self)
+
+    @classmethod
+    def de_estado(cls, estado: SimulacaoEstado) -> "SimulacaoEstadoCompacto":
+        """Converte um SimulacaoEstado comum (ex.: restaurado de um checkpoint) para o formato compacto."""
+        compacto = cls(estado.dinheiro_empresario,
+                       {agr_id: {"dinheiro": info["dinheiro"], "parcelas": list(info["parcelas"])}
+                        for agr_id, info in estado.agricultores.items()})
+        for agr_id, info in estado.agricultores.items():
+            i = compacto._indice[agr_id]
+            compacto.produtividade_total[i] = info["produtividade_total"]
+            compacto.poluicao_gerada[i] = info["poluicao_gerada"]
+            for categoria, itens in info["inventario"].items():
+                for nome_item in itens: compacto.adicionar_item(agr_id, categoria, nome_item)
+            for parcela_id, cultura in info["parcelas"].items():
+                if cultura is not None: compacto.plantar_parcela(agr_id, parcela_id, cultura)
+        for campo, valor in estado.__dict__.items():
+            if campo not in ("agricultores", "trava", "dinheiro_empresario", "_observadores"):
+                setattr(compacto, campo, valor)
+        return compacto
+
+    @classmethod
+    def restaurar(cls, dinheiro_empresario: float, agricultores: dict, *args, **kwargs) -> "SimulacaoEstadoCompacto":
+        return cls.de_estado(SimulacaoEstado.restaurar(dinheiro_empresario, agricultores, *args, **kwargs))
+
+    def __getstate__(self):
+        dados = super().__getstate__()
+        del dados["agricultores"]
+        return dados
+
+    def __setstate__(self, dados):
+        super().__setstate__(dados)
+        self.agricultores = _VisaoAgricultores(self)
+
+    def _coluna(self, categoria: str, nome_item: str) -> int:
+        coluna = self._coluna_item.get((categoria, nome_item))
+        if coluna is None:
+            coluna = len(self._itens)
+            if coluna == self.estoque.shape[1]:
+                self.estoque = np.concatenate([self.estoque, np.zeros_like(self.estoque)], axis=1)
+            self._itens.append((categoria, nome_item))
+            self._coluna_item[(categoria, nome_item)] = coluna
+            self._colunas_categoria[categoria].append(coluna)
+        return coluna
+
+    def _parcela(self, i: int, parcela_id: str) -> int:
+        inicio, fim = self._inicio_parcelas[i], self._inicio_parcelas[i + 1]
+        try:
+            return self._nomes_parcelas.index(parcela_id, inicio, fim)
+        except ValueError:
+            raise KeyError(parcela_id) from None
+
+    def quantidade_item(self, agricultor_id: str, categoria: str, nome_item: str) -> int:
+        coluna = self._coluna_item.get((categoria, nome_item))
+        return 0 if coluna is None else int(self.estoque[self._indice[agricultor_id], coluna])
+
+    def possui_item(self, agricultor_id: str, categoria: str, nome_item: str) -> bool:
+        return self.quantidade_item(agricultor_id, categoria, nome_item) > 0
+
+    def adicionar_item(self, agricultor_id: str, categoria: str, nome_item: str, quantidade: int = 1):
+        self.estoque[self._indice[agricultor_id], self._coluna(categoria, nome_item)] += quantidade
+        self.marcar(agricultor_id, "inventario")
+
+    def consumir_item(self, agricultor_id: str, categoria: str, nome_item: str):
+        i, coluna = self._indice[agricultor_id], self._coluna_item.get((categoria, nome_item))
+        if coluna is None or self.estoque[i, coluna] <= 0:
+            raise ValueError(f"'{nome_item}' não está no inventário de '{agricultor_id}'.")
+        self.estoque[i, coluna] -= 1
+        self.marcar(agricultor_id, "inventario")
+
+    def plantar_parcela(self, agricultor_id: str, parcela_id: str, cultura):
+        k = self._parcela(self._indice[agricultor_id], parcela_id)
+        if cultura is None:
+            self.cultura_parcela[k] = -1
+            return
+        if cultura not in self._codigo_cultura:
+            self._codigo_cultura[cultura] = len(self._culturas)
+            self._culturas.append(cultura)
+        self.cultura_parcela[k] = self._codigo_cultura[cultura]
+
+    def registrar_plantio(self, agricultor_id: str, parcela_id: str, cultura: str, produtividade: float,
+                          poluicao: int):
+        i = self._indice[agricultor_id]
+        self.produtividade_total[i] += produtividade
+        self.poluicao_gerada[i] += poluicao
+        self.plantar_parcela(agricultor_id, parcela_id, cultura)
+        self._acumular_plantio(agricultor_id, parcela_id, produtividade, poluicao)
+
+    def agricultor_como_dict(self, agricultor_id: str) -> dict:
+        info = self.agricultores[agricultor_id]
+        return {"dinheiro": info["dinheiro"],
+                "inventario": {categoria: list(itens) for categoria, itens in info["inventario"].items()},
+                "parcelas": dict(info["parcelas"]),
+                "produtividade_total": info["produtividade_total"],
+                "poluicao_gerada": info["poluicao_gerada"]}
+
+
+class _VisaoAgricultores(Mapping):
+    """agricultor_id -> visão dict-like dos dados do agricultor."""
+    __slots__ = ("_estado",)
+
+    def __init__(self, estado: SimulacaoEstadoCompacto):
+        self._estado = estado
+
+    def __getitem__(self, agricultor_id):
+        return _VisaoAgricultor(self._estado, self._estado._indice[agricultor_id])
+
+    def __contains__(self, agricultor_id):
+        return agricultor_id in self._estado._indice
+
+    def __iter__(self):
+        return iter(self._estado._ids)
+
+    def __len__(self):
+        return len(self._estado._ids)
+
+
+class _VisaoAgricultor(MutableMapping):
+    __slots__ = ("_estado", "_i")
+
+    def __init__(self, estado: SimulacaoEstadoCompacto, i: int):
+        self._estado, self._i = estado, i
+
+    def __getitem__(self, campo):
+        if campo == "dinheiro": return float(self._estado.dinheiro[self._i])
+        if campo == "produtividade_total": return float(self._estado.produtividade_total[self._i])
+        if campo == "poluicao_gerada": return int(self._estado.poluicao_gerada[self._i])
+        if campo == "inventario": return _VisaoInventario(self._estado, self._i)
+        if campo == "parcelas": return _VisaoParcelas(self._estado, self._i)
+        raise KeyError(campo)
+
+    def __setitem__(self, campo, valor):
+        if campo not in ("dinheiro", "produtividade_total", "poluicao_gerada"):
+            raise KeyError(f"Campo '{campo}' não pode ser substituído no estado compacto.")
+        getattr(self._estado, campo)[self._i] = valor
+
+    def __delitem__(self, campo):
+        raise KeyError(f"Campo '{campo}' não pode ser removido no estado compacto.")
+
+    def __iter__(self):
+        return iter(_CAMPOS_AGRICULTOR)
+
+    def __len__(self):
+        return len(_CAMPOS_AGRICULTOR)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class _VisaoInventario(Mapping):
+    __slots__ = ("_estado", "_i")
+
+    def __init__(self, estado: SimulacaoEstadoCompacto, i: int):
+        self._estado, self._i = estado, i
+
+    def __getitem__(self, categoria):
+        if categoria not in self._estado._colunas_categoria: raise KeyError(categoria)
+        return _VisaoItens(self._estado, self._i, categoria)
+
+    def __iter__(self):
+        return iter(CATEGORIAS_INVENTARIO)
+
+    def __len__(self):
+        return len(CATEGORIAS_INVENTARIO)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class _VisaoItens:
+    """Itens de uma categoria vistos como lista (um nome por unidade), com `in`/`remove`/`append` em O(1)."""
+    __slots__ = ("_estado", "_i", "_categoria")
+
+    def __init__(self, estado: SimulacaoEstadoCompacto, i: int, categoria: str):
+        self._estado, self._i, self._categoria = estado, i, categoria
+
+    def _quantidades(self):
+        linha = self._estado.estoque[self._i]
+        for coluna in self._estado._colunas_categoria[self._categoria]:
+            yield self._estado._itens[coluna][1], int(linha[coluna])
+
+    def __contains__(self, nome_item):
+        coluna = self._estado._coluna_item.get((self._categoria, nome_item))
+        return coluna is not None and self._estado.estoque[self._i, coluna] > 0
+
+    def __iter__(self):
+        for nome_item, quantidade in self._quantidades():
+            for _ in range(quantidade): yield nome_item
+
+    def __len__(self):
+        return sum(quantidade for _, quantidade in self._quantidades())
+
+    def append(self, nome_item: str):
+        self._estado.estoque[self._i, self._estado._coluna(self._categoria, nome_item)] += 1
+
+    def remove(self, nome_item: str):
+        if nome_item not in self: raise ValueError(f"'{nome_item}' não está na lista.")
+        self._estado.estoque[self._i, self._estado._coluna_item[(self._categoria, nome_item)]] -= 1
+
+    def clear(self):
+        self._estado.estoque[self._i, self._estado._colunas_categoria[self._categoria]] = 0
+
+    def __eq__(self, outro):
+        return list(self) == list(outro)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class _VisaoParcelas(MutableMapping):
+    __slots__ = ("_estado", "_i")
+
+    def __init__(self, estado: SimulacaoEstadoCompacto, i: int):
+        self._estado, self._i = estado, i
+
+    def __getitem__(self, parcela_id):
+        codigo = self._estado.cultura_parcela[self._estado._parcela(self._i, parcela_id)]
+        return None if codigo < 0 else self._estado._culturas[codigo]
+
+    def __setitem__(self, parcela_id, cultura):
+        self._estado.plantar_parcela(self._estado._ids[self._i], parcela_id, cultura)
+
+    def __delitem__(self, parcela_id):
+        raise KeyError(f"Parcela '{parcela_id}' não pode ser removida no estado compacto.")
+
+    def __iter__(self):
+        inicio, fim = self._estado._inicio_parcelas[self._i], self._estado._inicio_parcelas[self._i + 1]
+        return iter(self._estado._nomes_parcelas[inicio:fim])
+
+    def __len__(self):
+        return int(self._estado._inicio_parcelas[self._i + 1] - self._estado._inicio_parcelas[self._i])
+
+    def __repr__(self):
+        return repr(dict(self))
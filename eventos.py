@@ -0,0 +1,154 @@
+# eventos.py
+
+from langchain_core.callbacks import BaseCallbackHandler
+import copy
+import functools
+import inspect
+import json
+import queue
+import sys
+import threading
+import time
+
+# Níveis de verbosidade: cada evento só é gravado se o seu nível for <= ao nível do registro.
+NIVEIS = {"resumo": 0, "info": 1, "debug": 2}
+_FIM = object()
+
+
+def _serializar(evento: dict) -> str:
+    try:
+        return json.dumps(evento, ensure_ascii=False, default=str)
+    except Exception as erro:
+        return json.dumps({"ts": evento.get("ts"), "tipo": "erro_registro", "evento": str(evento.get("tipo")),
+                           "erro": repr(erro)}, ensure_ascii=False)
+
+
+def _instantaneo(valor):
+    """Cópia do valor no momento do evento: a thread de escrita só o serializa depois."""
+    if isinstance(valor, (str, int, float, bool, type(None))): return valor
+    try:
+        return copy.deepcopy(valor)
+    except Exception:
+        return str(valor)
+
+
+class RegistroEventos:
+    """
+    Grava eventos estruturados em JSON Lines. `emitir` só enfileira o evento; a escrita em disco
+    acontece em lotes numa thread de fundo, fora do caminho de cada passo do grafo.
+    """
+    def __init__(self, caminho: str = "simulacao_eventos.jsonl", nivel: str = "info", tamanho_lote: int = 256):
+        if nivel not in NIVEIS: raise ValueError(f"Nível de eventos inválido: '{nivel}'. Use um de {list(NIVEIS)}.")
+        self.nivel = NIVEIS[nivel]
+        self.tamanho_lote = tamanho_lote
+        self._fila = queue.SimpleQueue()
+        self._arquivo = open(caminho, "w", encoding="utf-8", buffering=1 << 16)
+        self._escritor = threading.Thread(target=self._escrever, name="registro-eventos", daemon=True)
+        self._escritor.start()
+
+    def ativo(self, nivel: str = "info") -> bool:
+        return NIVEIS[nivel] <= self.nivel
+
+    def emitir(self, tipo: str, nivel: str = "info", **dados):
+        if NIVEIS[nivel] > self.nivel: return
+        self._fila.put({"ts": time.time(), "tipo": tipo, **dados})
+
+    def _escrever(self):
+        while True:
+            lote = [self._fila.get()]
+            while len(lote) < self.tamanho_lote:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            fim = any(e is _FIM for e in lote)
+            # Uma falha aqui não pode encerrar a thread: os eventos seguintes se perderiam sem aviso.
+            try:
+                linhas = [_serializar(e) for e in lote if e is not _FIM]
+                if linhas: self._arquivo.write("\n".join(linhas) + "\n")
+            except Exception as erro:
+                print(f"[EVENTOS] Falha ao gravar {len(lote)} evento(s): {erro!r}", file=sys.stderr)
+            if fim: return
+
+    def fechar(self):
+        self._fila.put(_FIM)
+        self._escritor.join()
+        self._arquivo.close()
+
+
+class RegistroNulo:
+    """Registro padrão: descarta todos os eventos."""
+    def ativo(self, nivel: str = "info") -> bool:
+        return False
+
+    def emitir(self, tipo: str, nivel: str = "info", **dados):
+        pass
+
+    def fechar(self):
+        pass
+
+
+registro = RegistroNulo()
+
+
+def definir_registro(novo_registro):
+    global registro
+    registro = novo_registro
+
+
+def emitir(tipo: str, nivel: str = "info", **dados):
+    registro.emitir(tipo, nivel, **dados)
+
+
+def registrar_no(nome: str):
+    """
+    Decora um nó do LangGraph (síncrono ou assíncrono) emitindo eventos de entrada e saída. A saída é
+    emitida mesmo quando o nó falha, com a exceção em `erro`.
+    """
+    def decorador(funcao):
+        if inspect.iscoroutinefunction(funcao):
+            @functools.wraps(funcao)
+            async def envoltorio_async(state, *args, **kwargs):
+                inicio, erro = time.perf_counter(), None
+                emitir("no_inicio", no=nome, agricultor_id=state.get("current_agricultor_id"))
+                try:
+                    return await funcao(state, *args, **kwargs)
+                except BaseException as e:
+                    erro = repr(e)
+                    raise
+                finally:
+                    emitir("no_fim", no=nome, agricultor_id=state.get("current_agricultor_id"),
+                           duracao=time.perf_counter() - inicio, erro=erro)
+            return envoltorio_async
+
+        @functools.wraps(funcao)
+        def envoltorio(state, *args, **kwargs):
+            inicio, erro = time.perf_counter(), None
+            emitir("no_inicio", no=nome, agricultor_id=state.get("current_agricultor_id"))
+            try:
+                return funcao(state, *args, **kwargs)
+            except BaseException as e:
+                erro = repr(e)
+                raise
+            finally:
+                emitir("no_fim", no=nome, agricultor_id=state.get("current_agricultor_id"),
+                       duracao=time.perf_counter() - inicio, erro=erro)
+        return envoltorio
+    return decorador
+
+
+class CallbackEventos(BaseCallbackHandler):
+    """Emite um evento para cada chamada de ferramenta feita pelos agentes."""
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        emitir("ferramenta_inicio", ferramenta=(serialized or {}).get("name"), entrada=input_str,
+               run_id=kwargs.get("run_id"))
+
+    def on_tool_end(self, output, **kwargs):
+        emitir("ferramenta_fim", saida=_instantaneo(output), run_id=kwargs.get("run_id"))
+
+    def on_tool_error(self, error, **kwargs):
+        emitir("ferramenta_erro", nivel="resumo", erro=repr(error), run_id=kwargs.get("run_id"))
+
+    def on_llm_end(self, response, **kwargs):
+        emitir("llm_fim", nivel="debug", uso=(response.llm_output or {}).get("token_usage"),
+               run_id=kwargs.get("run_id"))
@@ -2,41 +2,106 @@
 
 from langchain_core.tools import tool
 from estado import SimulacaoEstado
+from estado import OFERTA_PENDENTE, OFERTA_CONTRAPROPOSTA, OFERTA_ACEITA, OFERTA_REJEITADA, OFERTA_FALHOU
+from estado import descrever_itens, itens_da_oferta
+from pydantic import BaseModel, Field
+from typing import Annotated, Literal
+import eventos
+from instrumentacao import medir_funcao
+from plantio import avaliar_plantio
+import contextvars
+import copy
+import functools
 import traceback
 
-_estado_global = None
-_catalogo_global = None
+CATALOGO_PADRAO = {
+    "semente": {"soja": 30, "arroz": 20, "hortalica": 10},
+    "fertilizante": {"fertilizante-comum": 30, "fertilizante-premium": 60, "fertilizante-super-premium": 90},
+    "agrotoxico": {"agrotoxico-comum": 30, "agrotoxico-premium": 60, "agrotoxico-super-premium": 90},
+    "maquina": {"pacote1": 30, "pacote2": 60, "pacote3": 90, "pulverizador": 400}
+}
 
+# Estado e catálogo usados pelas ferramentas. Ficam numa variável de contexto, não em globais do módulo, para
+# cada thread ou tarefa asyncio enxergar os seus. O resto da simulação (agentes, política, regras) ainda é global
+# em `simulacao`: simulações independentes rodam em processos separados (ver `lote`).
+_recursos = contextvars.ContextVar("recursos_ferramentas")
 
-def definir_recursos_globais(estado: SimulacaoEstado):
-    global _estado_global, _catalogo_global
-    _estado_global = estado
-    _catalogo_global = {
-        "semente": {"soja": 30, "arroz": 20, "hortalica": 10},
-        "fertilizante": {"fertilizante-comum": 30, "fertilizante-premium": 60, "fertilizante-super-premium": 90},
-        "agrotoxico": {"agrotoxico-comum": 30, "agrotoxico-premium": 60, "agrotoxico-super-premium": 90},
-        "maquina": {"pacote1": 30, "pacote2": 60, "pacote3": 90, "pulverizador": 400}
-    }
 
+def definir_recursos(estado: SimulacaoEstado, catalogo: dict = None) -> contextvars.Token:
+    """
+    Liga as ferramentas a `estado` e a um catálogo de preços (padrão: CATALOGO_PADRAO) no contexto atual.
+    Threads e tarefas criadas depois herdam a ligação; o token devolvido permite desfazê-la.
+    """
+    catalogo = copy.deepcopy(catalogo or CATALOGO_PADRAO)
+    estado.transacoes_registradas.definir_precos_tabela(
+        {item: preco for itens in catalogo.values() for item, preco in itens.items()})
+    return _recursos.set((estado, catalogo))
 
-def _realizar_compra(agricultor_id: str, categoria_item: str, nome_item: str, preco_final: float,
-                     quantidade: int = 1) -> str:
+
+def _estado() -> SimulacaoEstado:
+    try:
+        return _recursos.get()[0]
+    except LookupError:
+        raise RuntimeError("Ferramentas sem estado: chame definir_recursos() antes de usá-las.") from None
+
+
+def _catalogo() -> dict:
+    return _recursos.get()[1]
+
+
+def _ratear_preco(itens: list, preco_final: float) -> list:
+    """Divide o preço de uma cesta entre os itens, na proporção do valor de tabela de cada um."""
+    valores = [(preco_de_tabela(i["item"]) or 0) * i["quantidade"] for i in itens]
+    total = sum(valores)
+    partes = [round(preco_final * (v / total if total else 1 / len(itens)), 2) for v in valores[:-1]]
+    return partes + [round(preco_final - sum(partes), 2)]
+
+
+@medir_funcao("_realizar_compra")
+def _realizar_compra(agricultor_id: str, itens: list, preco_final: float) -> str:
+    """
+    Liquida a compra de `itens` ([{"item", "quantidade"}, ...]) por `preco_final` de uma vez: ou todos os
+    itens entram no inventário e o dinheiro é transferido, ou nada muda. Cada item vira uma transação.
+    """
+    estado = _estado()
     try:
-        if agricultor_id not in _estado_global.agricultores: return f"ERRO: Agricultor com ID '{agricultor_id}' não existe."
-        dinheiro_agricultor = _estado_global.agricultores[agricultor_id]["dinheiro"]
-        if dinheiro_agricultor < preco_final:
-            return (f"ERRO: Dinheiro insuficiente. Custo: R${preco_final:.2f}, Saldo: R${dinheiro_agricultor:.2f}")
-
-        _estado_global.agricultores[agricultor_id]["dinheiro"] -= preco_final
-        _estado_global.dinheiro_empresario += preco_final
-
-        chave_inventario = "maquina_alugada" if categoria_item == "maquina" else categoria_item
-        _estado_global.agricultores[agricultor_id]['inventario'][chave_inventario].append(nome_item)
-        transacao = {"comprador": agricultor_id, "vendedor": "Empresario", "item": nome_item, "quantidade": quantidade,
-                     "preco_total": preco_final}
-        _estado_global.transacoes_registradas.append(transacao)
-        print(f"\n[FERRAMENTA] Transação bem-sucedida: {transacao}")
-        return f"SUCESSO: Venda de {quantidade} de {nome_item} para {agricultor_id} por R${preco_final:.2f} concluída."
+        if agricultor_id not in estado.agricultores: return f"ERRO: Agricultor com ID '{agricultor_id}' não existe."
+        categorias = [_categoria_do_item(i["item"]) for i in itens]
+        for item, categoria in zip(itens, categorias):
+            if not categoria: return f"ERRO: Item '{item['item']}' não encontrado no catálogo."
+        transacoes = [{"comprador": agricultor_id, "vendedor": "Empresario", "item": item["item"],
+                       "quantidade": item["quantidade"], "preco_total": parte}
+                      for item, parte in zip(itens, _ratear_preco(itens, preco_final))]
+        with estado.trava:
+            info = estado.agricultores[agricultor_id]
+            dinheiro_agricultor, dinheiro_empresario = info["dinheiro"], estado.dinheiro_empresario
+            if dinheiro_agricultor < preco_final:
+                return (f"ERRO: Dinheiro insuficiente. Custo: R${preco_final:.2f}, Saldo: R${dinheiro_agricultor:.2f}")
+            # O que pode falhar vem antes de mexer no estado; se algo falhar depois, tudo é desfeito.
+            estado.reservar_transacoes(len(transacoes))
+            entregues = []
+            try:
+                info["dinheiro"] = dinheiro_agricultor - preco_final
+                estado.dinheiro_empresario = dinheiro_empresario + preco_final
+                for item, categoria in zip(itens, categorias):
+                    chave_inventario = "maquina_alugada" if categoria == "maquina" else categoria
+                    estado.adicionar_item(agricultor_id, chave_inventario, item["item"], item["quantidade"])
+                    entregues.append((chave_inventario, item))
+                for transacao in transacoes: estado.registrar_transacao(transacao)
+            except Exception:
+                info["dinheiro"], estado.dinheiro_empresario = dinheiro_agricultor, dinheiro_empresario
+                for chave_inventario, item in entregues:
+                    for _ in range(item["quantidade"]):
+                        estado.consumir_item(agricultor_id, chave_inventario, item["item"])
+                raise
+            estado.marcar(agricultor_id, "dinheiro")
+            estado.marcar_empresario()
+            for transacao in transacoes: eventos.emitir("transacao", nivel="resumo", **transacao)
+            eventos.emitir("delta_estado", agricultor_id=agricultor_id, dinheiro=info["dinheiro"],
+                           dinheiro_empresario=estado.dinheiro_empresario)
+        for transacao in transacoes: print(f"\n[FERRAMENTA] Transação bem-sucedida: {transacao}")
+        descricao = ", ".join(f"{i['quantidade']} de {i['item']}" for i in itens)
+        return f"SUCESSO: Venda de {descricao} para {agricultor_id} por R${preco_final:.2f} concluída."
     except Exception:
         return f"ERRO INESPERADO NA FERRAMENTA: {traceback.format_exc()}"
 
@@ -44,138 +109,222 @@ def _realizar_compra(agricultor_id: str, categoria_item: str, nome_item: str, pr
 @tool
 def consultar_inventario(agricultor_id: str) -> dict:
     """Use para verificar os itens que você possui atualmente E as parcelas de terra sob sua responsabilidade, indicando quais estão vazias. É sua primeira ação em todo turno."""
-    if agricultor_id in _estado_global.agricultores:
+    estado = _estado()
+    if agricultor_id in estado.agricultores:
+        info = estado.agricultor_como_dict(agricultor_id)
         inventario_e_parcelas = {
-            "inventario": _estado_global.agricultores[agricultor_id]['inventario'],
-            "parcelas": _estado_global.agricultores[agricultor_id]['parcelas']
+            "inventario": info['inventario'],
+            "parcelas": info['parcelas']
         }
         return inventario_e_parcelas
     return {"erro": "Agricultor não encontrado."}
 
 
 @tool
-def fazer_oferta(agricultor_id: str, tipo_item: str, quantidade: int, preco_proposto: float) -> str:
-    """Use esta ferramenta para iniciar uma negociação, propondo um preço para um insumo."""
-    _estado_global.negociacao_em_andamento = {
-        "oferta_ativa": True,
-        "agricultor_id": agricultor_id,
-        "item": tipo_item,
-        "quantidade": quantidade,
-        "preco_proposto": preco_proposto,
-        "ultimo_ofertante": "Agricultor"
-    }
-    return f"OFERTA ENVIADA. Sua proposta de R${preco_proposto:.2f} pelo item '{tipo_item}' foi enviada. AGUARDE A RESPOSTA DO EMPRESÁRIO."
+def fazer_oferta(agricultor_id: str, tipo_item: str, quantidade: int,
+                 preco_proposto: Annotated[float, "Preço TOTAL pelas `quantidade` unidades (preço unitário x quantidade)."]) -> str:
+    """Use esta ferramenta para iniciar uma negociação, propondo um preço para um insumo. `preco_proposto` é o preço total do lote: para 2 unidades de um item de R$30, o valor de tabela é R$60."""
+    estado = _estado()
+    if agricultor_id not in estado.agricultores: return f"ERRO: Agricultor com ID '{agricultor_id}' não existe."
+    if quantidade < 1: return "ERRO: A quantidade deve ser de pelo menos 1."
+    if preco_proposto < 0: return "ERRO: O preço proposto não pode ser negativo."
+    oferta = estado.registrar_oferta(agricultor_id, tipo_item, quantidade, preco_proposto)
+    return f"OFERTA ENVIADA ({oferta['oferta_id']}). Sua proposta de R${preco_proposto:.2f} pelo item '{tipo_item}' foi enviada. AGUARDE A RESPOSTA DO EMPRESÁRIO."
+
+
+class ItemCesta(BaseModel):
+    tipo_item: str = Field(description="ID do item no catálogo, por exemplo 'soja' ou 'pacote1'.")
+    quantidade: int = Field(default=1, ge=1)
+
+
+@tool
+def fazer_oferta_cesta(agricultor_id: str, itens: list[ItemCesta], preco_proposto: float) -> str:
+    """Use esta ferramenta para pedir VÁRIOS insumos em uma única negociação (por exemplo, semente + pacote de máquina + fertilizante para uma parcela), propondo um preço total pela cesta. Se aceita, todos os itens são entregues de uma vez."""
+    estado = _estado()
+    if agricultor_id not in estado.agricultores: return f"ERRO: Agricultor com ID '{agricultor_id}' não existe."
+    quantidades = {}
+    for item in itens:
+        if isinstance(item, dict): item = ItemCesta(**item)
+        quantidades[item.tipo_item] = quantidades.get(item.tipo_item, 0) + item.quantidade
+    if not quantidades: return "ERRO: A cesta está vazia."
+    if preco_proposto < 0: return "ERRO: O preço proposto não pode ser negativo."
+    oferta = estado.registrar_oferta(agricultor_id, None, None, preco_proposto,
+                                     itens=[{"item": nome, "quantidade": q} for nome, q in quantidades.items()])
+    return f"OFERTA ENVIADA ({oferta['oferta_id']}). Sua proposta de R${preco_proposto:.2f} por {descrever_itens(oferta)} foi enviada. AGUARDE A RESPOSTA DO EMPRESÁRIO."
 
 
 @tool
 def plantar_semente(agricultor_id: str, parcela_id: str, tipo_semente: str, pacote_maquina: str,
                     tipo_fertilizante: str = None, tipo_agrotoxico: str = None) -> str:
     """Ação final para plantar. Requer uma semente e um pacote de máquina. Opcionalmente, pode-se usar fertilizante e agrotóxico (que requer um pulverizador)."""
+    estado = _estado()
     try:
-        if agricultor_id not in _estado_global.agricultores: return f"ERRO: Agricultor com ID '{agricultor_id}' não existe."
-        inventario = _estado_global.agricultores[agricultor_id]["inventario"]
-        parcelas_agricultor = _estado_global.agricultores[agricultor_id]["parcelas"]
+        if agricultor_id not in estado.agricultores: return f"ERRO: Agricultor com ID '{agricultor_id}' não existe."
+        possui = functools.partial(estado.possui_item, agricultor_id)
+        parcelas_agricultor = estado.agricultores[agricultor_id]["parcelas"]
         if parcela_id not in parcelas_agricultor: return f"ERRO: Parcela '{parcela_id}' não pertence ao agricultor '{agricultor_id}'."
-        if tipo_semente not in inventario[
-            "semente"]: return f"ERRO: Semente '{tipo_semente}' não encontrada no inventário."
-        if pacote_maquina not in inventario[
-            "maquina_alugada"]: return f"ERRO: Pacote de máquina '{pacote_maquina}' não encontrado no inventário. Alugue um primeiro."
-        if tipo_agrotoxico and "pulverizador" not in inventario[
-            "maquina_alugada"]: return f"ERRO: Para usar agrotóxico, você precisa alugar um 'pulverizador'."
-        if tipo_fertilizante and tipo_fertilizante not in inventario[
-            "fertilizante"]: return f"ERRO: Fertilizante '{tipo_fertilizante}' não encontrado no inventário."
-        if tipo_agrotoxico and tipo_agrotoxico not in inventario[
-            "agrotoxico"]: return f"ERRO: Agrotóxico '{tipo_agrotoxico}' não encontrado no inventário."
+        if not possui("semente", tipo_semente): return f"ERRO: Semente '{tipo_semente}' não encontrada no inventário."
+        if not possui("maquina_alugada", pacote_maquina): return f"ERRO: Pacote de máquina '{pacote_maquina}' não encontrado no inventário. Alugue um primeiro."
+        if tipo_agrotoxico and not possui("maquina_alugada", "pulverizador"): return f"ERRO: Para usar agrotóxico, você precisa alugar um 'pulverizador'."
+        if tipo_fertilizante and not possui("fertilizante", tipo_fertilizante): return f"ERRO: Fertilizante '{tipo_fertilizante}' não encontrado no inventário."
+        if tipo_agrotoxico and not possui("agrotoxico", tipo_agrotoxico): return f"ERRO: Agrotóxico '{tipo_agrotoxico}' não encontrado no inventário."
         if parcelas_agricultor[parcela_id] is not None: return f"ERRO: A parcela '{parcela_id}' já está plantada."
 
-        inventario["semente"].remove(tipo_semente)
-        if tipo_fertilizante: inventario["fertilizante"].remove(tipo_fertilizante)
-        if tipo_agrotoxico: inventario["agrotoxico"].remove(tipo_agrotoxico)
-
-        produtividade = 50
-        poluicao = {"soja": 30, "arroz": 20, "hortalica": 10}.get(tipo_semente, 15)
-        produtividade += {"pacote1": 25, "pacote2": 60, "pacote3": 150}.get(pacote_maquina, 0)
-        produtividade += {"fertilizante-comum": 50, "fertilizante-premium": 120, "fertilizante-super-premium": 250}.get(
-            tipo_fertilizante, 0)
-        if tipo_agrotoxico:
-            bonus_agro = {"agrotoxico-comum": 200, "agrotoxico-premium": 500, "agrotoxico-super-premium": 1000}.get(
-                tipo_agrotoxico, 0)
-            produtividade += bonus_agro
-            if tipo_semente == 'soja':
-                produtividade *= 3
-            elif tipo_semente == 'arroz':
-                produtividade *= 2
-            poluicao += {"agrotoxico-comum": 100, "agrotoxico-premium": 150, "agrotoxico-super-premium": 250}.get(
-                tipo_agrotoxico, 50)
-            if "pulverizador" in inventario["maquina_alugada"]: poluicao /= 2
-
-        _estado_global.agricultores[agricultor_id]["produtividade_total"] += produtividade
-        _estado_global.agricultores[agricultor_id]["poluicao_gerada"] += int(poluicao)
-        _estado_global.agricultores[agricultor_id]["parcelas"][parcela_id] = f"{tipo_semente}"
+        estado.consumir_item(agricultor_id, "semente", tipo_semente)
+        if tipo_fertilizante: estado.consumir_item(agricultor_id, "fertilizante", tipo_fertilizante)
+        if tipo_agrotoxico: estado.consumir_item(agricultor_id, "agrotoxico", tipo_agrotoxico)
+
+        produtividade, poluicao = avaliar_plantio(tipo_semente, pacote_maquina, tipo_fertilizante, tipo_agrotoxico,
+                                                  possui("maquina_alugada", "pulverizador"))
+
+        estado.registrar_plantio(agricultor_id, parcela_id, f"{tipo_semente}", produtividade, poluicao)
+        eventos.emitir("plantio", nivel="resumo", agricultor_id=agricultor_id, parcela_id=parcela_id,
+                       semente=tipo_semente, produtividade=produtividade, poluicao=poluicao)
+        eventos.emitir("delta_estado", agricultor_id=agricultor_id,
+                       produtividade_total=estado.agricultores[agricultor_id]["produtividade_total"],
+                       poluicao_gerada=estado.agricultores[agricultor_id]["poluicao_gerada"])
         print(f"\n[FERRAMENTA] Plantio bem-sucedido na parcela {parcela_id}.")
-        return f"SUCESSO: Você plantou {tipo_semente}. Produtividade desta colheita: R${produtividade:.2f}. Poluição gerada: {int(poluicao)}."
+        return f"SUCESSO: Você plantou {tipo_semente}. Produtividade desta colheita: R${produtividade:.2f}. Poluição gerada: {poluicao}."
     except Exception:
         return f"ERRO INESPERADO: {traceback.format_exc()}"
 
 
-@tool
-def aceitar_oferta() -> str:
-    """Use esta ferramenta para aceitar la oferta atual feita pelo agricultor. Isso finalizará a transação."""
+def _categoria_do_item(item_nome: str):
+    for cat, itens in _catalogo().items():
+        if item_nome in itens: return cat
+    return None
+
+
+def preco_de_tabela(item_nome: str):
+    categoria = _categoria_do_item(item_nome)
+    return _catalogo()[categoria][item_nome] if categoria else None
+
+
+def valor_de_tabela(oferta: dict):
+    """Valor de tabela de todos os itens da oferta (preço x quantidade); None se algum item não está no catálogo."""
+    precos = [(preco_de_tabela(i["item"]), i["quantidade"]) for i in itens_da_oferta(oferta)]
+    if any(preco is None for preco, _ in precos): return None
+    return sum(preco * quantidade for preco, quantidade in precos)
+
+
+def _oferta_pendente(oferta_id: str):
+    estado = _estado()
+    oferta = estado.livro_ofertas.get(oferta_id)
+    if not oferta: return None, f"ERRO: Oferta '{oferta_id}' não existe."
+    if oferta["status"] != OFERTA_PENDENTE:
+        return None, f"ERRO: A oferta '{oferta_id}' não aguarda resposta do empresário (status: {oferta['status']})."
+    return oferta, None
+
+
+def _aceitar(oferta_id: str) -> str:
+    estado = _estado()
     try:
-        negociacao = _estado_global.negociacao_em_andamento
-        if not negociacao['oferta_ativa']: return "ERRO: Não há nenhuma oferta ativa para aceitar."
-
-        agr_id = negociacao['agricultor_id']
-        preco_final = negociacao['preco_proposto']
-        item_nome = negociacao['item']
-        quantidade = negociacao['quantidade']
-
-        categoria_item = None
-        for cat, itens in _catalogo_global.items():
-            if item_nome in itens:
-                categoria_item = cat
-                break
-        if not categoria_item: return f"ERRO: Item '{item_nome}' não encontrado no catálogo."
-
-        resultado_compra = _realizar_compra(agr_id, categoria_item, item_nome, preco_final, quantidade)
-
-        _estado_global.negociacao_em_andamento = {"oferta_ativa": False, "ultimo_ofertante": None,
-                                                  "agricultor_id": None, "item": None, "quantidade": 0,
-                                                  "preco_proposto": 0.0}
-        return resultado_compra
+        with estado.trava:
+            oferta, erro = _oferta_pendente(oferta_id)
+            if erro: return erro
+
+            itens = itens_da_oferta(oferta)
+            desconhecido = next((i["item"] for i in itens if not _categoria_do_item(i["item"])), None)
+            if desconhecido:
+                estado.encerrar_oferta(oferta_id, OFERTA_REJEITADA)
+                return f"ERRO: Item '{desconhecido}' não encontrado no catálogo. Oferta '{oferta_id}' encerrada."
+
+            resultado_compra = _realizar_compra(oferta['agricultor_id'], itens, oferta['preco_proposto'])
+            estado.encerrar_oferta(oferta_id, OFERTA_ACEITA if resultado_compra.startswith("SUCESSO")
+                                           else OFERTA_FALHOU)
+            return resultado_compra
+    except Exception:
+        return f"ERRO INESPERADO: {traceback.format_exc()}"
+
+
+def _rejeitar(oferta_id: str) -> str:
+    estado = _estado()
+    try:
+        with estado.trava:
+            oferta, erro = _oferta_pendente(oferta_id)
+            if erro: return erro
+
+            estado.encerrar_oferta(oferta_id, OFERTA_REJEITADA)
+        eventos.emitir("oferta_rejeitada", oferta_id=oferta_id, agricultor_id=oferta["agricultor_id"])
+        print(f"\n[FERRAMENTA] Oferta {oferta_id} REJEITADA.")
+        return f"Sua oferta {oferta_id} foi rejeitada pelo empresário. A negociação sobre {descrever_itens(oferta)} foi encerrada."
+    except Exception:
+        return f"ERRO INESPERADO: {traceback.format_exc()}"
+
+
+def _contra_ofertar(oferta_id: str, novo_preco: float) -> str:
+    estado = _estado()
+    try:
+        with estado.trava:
+            oferta, erro = _oferta_pendente(oferta_id)
+            if erro: return erro
+
+            oferta['preco_proposto'] = novo_preco
+            oferta['ultimo_ofertante'] = 'Empresario'
+            oferta['status'] = OFERTA_CONTRAPROPOSTA
+            estado.marcar_oferta(oferta_id)
+
+        print(f"\n[FERRAMENTA] Contra-oferta feita pelo Empresário na oferta {oferta_id}: novo preço R${novo_preco:.2f}.")
+        return f"SUCESSO: Sua contra-oferta de R${novo_preco:.2f} para a oferta {oferta_id} foi enviada ao agricultor."
     except Exception:
         return f"ERRO INESPERADO: {traceback.format_exc()}"
 
 
 @tool
-def rejeitar_oferta() -> str:
-    """Use esta ferramenta para rejeitar e descartar la oferta atual do agricultor."""
-    if not _estado_global.negociacao_em_andamento[
-        'oferta_ativa']: return "ERRO: Não há nenhuma oferta ativa para rejeitar."
+def precificar_oferta(oferta_id: str) -> str:
+    """Use esta ferramenta para ver o valor de tabela de cada item da oferta `oferta_id` (útil em cestas com vários itens) e quanto a proposta representa desse total."""
+    oferta = _estado().livro_ofertas.get(oferta_id)
+    if not oferta: return f"ERRO: Oferta '{oferta_id}' não existe."
+    linhas = []
+    for i in itens_da_oferta(oferta):
+        preco = preco_de_tabela(i["item"])
+        linhas.append(f"- {i['quantidade']} x '{i['item']}': " +
+                      (f"R${preco:.2f} cada, R${preco * i['quantidade']:.2f} no total" if preco is not None
+                       else "fora do catálogo"))
+    total = valor_de_tabela(oferta)
+    if total:
+        linhas.append(f"Valor de tabela: R${total:.2f}. Proposta: R${oferta['preco_proposto']:.2f} "
+                      f"({oferta['preco_proposto'] / total:.0%} da tabela).")
+    return f"Oferta {oferta_id} ({oferta['status']}):\n" + "\n".join(linhas)
 
-    agr_id = _estado_global.negociacao_em_andamento['agricultor_id']
-    msg = f"Sua oferta foi rejeitada pelo empresário. A negociação sobre o item '{_estado_global.negociacao_em_andamento['item']}' foi encerrada."
 
-    _estado_global.negociacao_em_andamento = {"oferta_ativa": False, "ultimo_ofertante": "Empresario",
-                                              "agricultor_id": agr_id, "item": None, "quantidade": 0,
-                                              "preco_proposto": 0.0}
-    print(f"\n[FERRAMENTA] Oferta REJEITADA.")
-    return msg
+@tool
+def aceitar_oferta(oferta_id: str) -> str:
+    """Use esta ferramenta para aceitar a oferta `oferta_id` feita por um agricultor. Isso finalizará a transação (em uma cesta, de todos os itens de uma vez)."""
+    return _aceitar(oferta_id)
 
 
 @tool
-def fazer_contra_oferta(novo_preco: float) -> str:
-    """Use esta ferramenta para rejeitar la oferta do agricultor e propor um novo preço."""
-    try:
-        negociacao = _estado_global.negociacao_em_andamento
-        if not negociacao['oferta_ativa']: return "ERRO: Não há oferta ativa para fazer uma contra-proposta."
-        if negociacao[
-            'ultimo_ofertante'] == 'Empresario': return "ERRO: Você já fez uma contra-proposta. Aguarde a resposta do agricultor."
+def rejeitar_oferta(oferta_id: str) -> str:
+    """Use esta ferramenta para rejeitar e descartar a oferta `oferta_id` de um agricultor."""
+    return _rejeitar(oferta_id)
 
-        negociacao['preco_proposto'] = novo_preco
-        negociacao['ultimo_ofertante'] = 'Empresario'
 
-        print(f"\n[FERRAMENTA] Contra-oferta feita pelo Empresário: novo preço R${novo_preco:.2f}.")
-        return f"SUCESSO: Sua contra-oferta de R${novo_preco:.2f} foi enviada ao agricultor."
-    except Exception:
-        return f"ERRO INESPERADO: {traceback.format_exc()}"
\ No newline at end of file
+@tool
+def fazer_contra_oferta(oferta_id: str, novo_preco: float) -> str:
+    """Use esta ferramenta para rejeitar a oferta `oferta_id` do agricultor e propor um novo preço (em uma cesta, o preço total da cesta)."""
+    return _contra_ofertar(oferta_id, novo_preco)
+
+
+class DecisaoOferta(BaseModel):
+    oferta_id: str = Field(description="ID da oferta, por exemplo 'OF3'.")
+    acao: Literal["aceitar", "rejeitar", "contra_oferta"]
+    novo_preco: float | None = Field(default=None, description="Obrigatório quando acao='contra_oferta'.")
+
+
+@tool
+def responder_ofertas(decisoes: list[DecisaoOferta]) -> str:
+    """Use esta ferramenta para responder VÁRIAS ofertas pendentes de uma só vez, uma decisão por oferta."""
+    resultados = []
+    for decisao in decisoes:
+        if isinstance(decisao, dict): decisao = DecisaoOferta(**decisao)
+        if decisao.acao == "aceitar":
+            resultado = _aceitar(decisao.oferta_id)
+        elif decisao.acao == "rejeitar":
+            resultado = _rejeitar(decisao.oferta_id)
+        elif decisao.novo_preco is None:
+            resultado = f"ERRO: Contra-oferta para '{decisao.oferta_id}' sem novo_preco."
+        else:
+            resultado = _contra_ofertar(decisao.oferta_id, decisao.novo_preco)
+        resultados.append(f"[{decisao.oferta_id}] {resultado}")
+    return "\n".join(resultados)
@@ -0,0 +1,88 @@
+# historico.py
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, HumanMessage
+from estado import SimulacaoEstado, ESTADOS_ABERTOS, descrever_itens
+import re
+
+
+def _sem_think(texto: str) -> str:
+    texto = re.sub(r"<think>.*?</think>", "", texto, flags=re.DOTALL)
+    return re.sub(r"<think>.*", "", texto, flags=re.DOTALL).strip()
+
+
+# Ecos de ferramentas repetidos na conversa; só o mais recente ainda é útil ao modelo.
+_ECO_FERRAMENTA = re.compile(r"^(OFERTA ENVIADA|SUCESSO|ERRO)")
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa barata (~4 caracteres por token), suficiente para controlar o orçamento."""
+    return len(texto) // 4 + 1
+
+
+class GerenciadorHistorico:
+    """
+    Monta o `chat_history` de cada chamada com tamanho limitado: um resumo estruturado da negociação
+    do agricultor, seguido dos últimos `max_turnos` turnos que couberem em `orcamento_tokens`.
+    """
+    def __init__(self, orcamento_tokens: int = 1200, max_turnos: int = 6, max_ofertas_resumo: int = 3):
+        self.orcamento_tokens = orcamento_tokens
+        self.max_turnos = max_turnos
+        self.max_ofertas_resumo = max_ofertas_resumo
+
+    def resumo_negociacao(self, sim_estado: SimulacaoEstado, agr_id: str) -> str:
+        info = sim_estado.agricultores[agr_id]
+        vazias = [p for p, cultura in info["parcelas"].items() if cultura is None]
+        linhas = [f"RESUMO DA NEGOCIAÇÃO COM {agr_id}:",
+                  f"- Dinheiro do agricultor: R${info['dinheiro']:.2f}",
+                  f"- Parcelas vazias: {', '.join(vazias) if vazias else 'nenhuma'}"]
+        aberta = sim_estado.oferta_aberta_de(agr_id)
+        linhas.append(f"- Oferta em aberto: {aberta['oferta_id']} {descrever_itens(aberta)} por "
+                      f"R${aberta['preco_proposto']:.2f} ({aberta['status']})" if aberta else "- Oferta em aberto: nenhuma")
+        encerradas = [o for o in reversed(sim_estado.livro_ofertas.values())
+                      if o["agricultor_id"] == agr_id and o["status"] not in ESTADOS_ABERTOS][:self.max_ofertas_resumo]
+        for o in encerradas:
+            linhas.append(f"- {o['oferta_id']}: {descrever_itens(o)} por R${o['preco_proposto']:.2f} -> {o['status']}")
+        return "\n".join(linhas)
+
+    def montar(self, mensagens: list[BaseMessage], sim_estado: SimulacaoEstado, agr_id: str) -> list[BaseMessage]:
+        # Vai como mensagem de usuário: alguns templates locais recusam um segundo "system" no meio da conversa.
+        resumo = HumanMessage(content=self.resumo_negociacao(sim_estado, agr_id))
+        restante = self.orcamento_tokens - estimar_tokens(resumo.content)
+
+        selecionadas = []
+        viu_eco = False
+        for msg in reversed(mensagens[-self.max_turnos:]):
+            conteudo = _sem_think(msg.content) if isinstance(msg.content, str) else msg.content
+            if not conteudo: continue
+            if isinstance(conteudo, str) and _ECO_FERRAMENTA.match(conteudo):
+                if viu_eco: continue
+                viu_eco = True
+            custo = estimar_tokens(str(conteudo))
+            if custo > restante: break
+            restante -= custo
+            selecionadas.append(msg if conteudo == msg.content else msg.model_copy(update={"content": conteudo}))
+        return [resumo] + list(reversed(selecionadas))
+
+
+class ContadorTokensPrompt(BaseCallbackHandler):
+    """Registra os tokens de prompt/completação informados pelo servidor em cada chamada ao LLM."""
+    def __init__(self):
+        self.chamadas = []
+
+    def on_llm_end(self, response, **kwargs):
+        uso = (response.llm_output or {}).get("token_usage") or {}
+        if not uso and response.generations and response.generations[0]:
+            # Em streaming o ChatOpenAI não preenche o llm_output; o uso vem no usage_metadata da mensagem.
+            metadados = getattr(getattr(response.generations[0][0], "message", None), "usage_metadata", None)
+            if metadados: uso = {"prompt_tokens": metadados.get("input_tokens", 0),
+                                 "completion_tokens": metadados.get("output_tokens", 0)}
+        self.chamadas.append({"prompt": uso.get("prompt_tokens", 0), "completacao": uso.get("completion_tokens", 0)})
+        print(f"[TOKENS] Chamada {len(self.chamadas)}: prompt={uso.get('prompt_tokens', '?')} "
+              f"completação={uso.get('completion_tokens', '?')}")
+
+    def resumo(self) -> str:
+        if not self.chamadas: return "Tokens de prompt: nenhuma chamada registrada."
+        prompts = [c["prompt"] for c in self.chamadas]
+        return (f"Tokens de prompt: {len(prompts)} chamadas | média {sum(prompts) / len(prompts):.0f} | "
+                f"máximo {max(prompts)} | total {sum(prompts)}")
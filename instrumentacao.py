@@ -0,0 +1,214 @@
+# instrumentacao.py
+
+from langchain_core.callbacks import BaseCallbackHandler
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+from contextlib import contextmanager
+import functools
+import inspect
+import json
+import threading
+import time
+
+# Nome da ferramenta que o AgentExecutor usa quando `handle_parsing_errors` captura uma saída inválida do modelo.
+_FERRAMENTA_ERRO_PARSING = "_Exception"
+# O SDK da OpenAI refaz as requisições sozinho (`max_retries`) e numera cada tentativa neste cabeçalho.
+_CABECALHO_TENTATIVA = "x-stainless-retry-count"
+
+
+def _metrica_vazia() -> dict:
+    return {"chamadas": 0, "tempo_total": 0.0, "tempo_max": 0.0, "tokens_prompt": 0, "tokens_completacao": 0,
+            "erros": 0, "retries": 0, "erros_parsing": 0}
+
+
+class Instrumentacao:
+    """
+    Acumula tempo de parede, tokens, retries e erros por categoria (no, agente, ferramenta, llm, funcao)
+    e por nome. O que sobra do tempo total da execução depois dos nós é atribuído ao próprio grafo.
+    """
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.metricas = {}
+        self._inicio_execucao = None
+        self.tempo_execucao = 0.0
+
+    def reiniciar(self):
+        with self._trava:
+            self.metricas = {}
+        self._inicio_execucao = None
+        self.tempo_execucao = 0.0
+
+    def _metrica(self, categoria: str, nome: str) -> dict:
+        chave = (categoria, nome)
+        if chave not in self.metricas: self.metricas[chave] = _metrica_vazia()
+        return self.metricas[chave]
+
+    def registrar(self, categoria: str, nome: str, duracao: float = 0.0, chamadas: int = 1, **contadores):
+        with self._trava:
+            metrica = self._metrica(categoria, nome)
+            metrica["chamadas"] += chamadas
+            metrica["tempo_total"] += duracao
+            metrica["tempo_max"] = max(metrica["tempo_max"], duracao)
+            for campo, valor in contadores.items(): metrica[campo] += valor
+
+    @contextmanager
+    def medir(self, categoria: str, nome: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(categoria, nome, time.perf_counter() - inicio)
+
+    def iniciar_execucao(self):
+        self._inicio_execucao = time.perf_counter()
+
+    def finalizar_execucao(self):
+        if self._inicio_execucao is not None:
+            self.tempo_execucao = time.perf_counter() - self._inicio_execucao
+
+    def relatorio(self) -> dict:
+        with self._trava:
+            linhas = [{"categoria": cat, "nome": nome, **m} for (cat, nome), m in sorted(self.metricas.items())]
+        tempo_nos = sum(l["tempo_total"] for l in linhas if l["categoria"] == "no")
+        return {"tempo_execucao": self.tempo_execucao,
+                "tempo_nos": tempo_nos,
+                # Em modo concorrente os nós se sobrepõem e a sobra pode ficar negativa; nesse caso vale zero.
+                "tempo_grafo": max(self.tempo_execucao - tempo_nos, 0.0),
+                "metricas": linhas}
+
+    def exportar_json(self, caminho: str):
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.relatorio(), f, ensure_ascii=False, indent=2)
+
+    def tabela_resumo(self) -> str:
+        relatorio = self.relatorio()
+        cabecalho = f"{'categoria':<11}{'nome':<30}{'chamadas':>9}{'total(s)':>10}{'médio(s)':>10}{'máx(s)':>9}" \
+                    f"{'tok.prompt':>11}{'tok.compl.':>11}{'erros':>7}{'retries':>8}{'parsing':>8}"
+        linhas = [cabecalho, "-" * len(cabecalho)]
+        for m in relatorio["metricas"]:
+            medio = m["tempo_total"] / m["chamadas"] if m["chamadas"] else 0.0
+            linhas.append(f"{m['categoria']:<11}{m['nome'][:29]:<30}{m['chamadas']:>9}{m['tempo_total']:>10.3f}"
+                          f"{medio:>10.3f}{m['tempo_max']:>9.3f}{m['tokens_prompt']:>11}{m['tokens_completacao']:>11}"
+                          f"{m['erros']:>7}{m['retries']:>8}{m['erros_parsing']:>8}")
+        linhas.append("-" * len(cabecalho))
+        linhas.append(f"Execução: {relatorio['tempo_execucao']:.3f}s | nós: {relatorio['tempo_nos']:.3f}s | "
+                      f"sobrecarga do grafo: {relatorio['tempo_grafo']:.3f}s")
+        return "\n".join(linhas)
+
+
+coletor = Instrumentacao()
+
+
+def medir_funcao(nome: str):
+    """Decora uma função comum (ex.: `_realizar_compra`) medindo seu tempo na categoria "funcao"."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            with coletor.medir("funcao", nome):
+                return funcao(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+
+def medir_no(nome: str, agente: str = None):
+    """
+    Decora um nó (síncrono ou assíncrono) medindo o tempo por nó e por agente. Sem `agente`,
+    o agente é o agricultor da negociação corrente.
+    """
+    def decorador(funcao):
+        def _registrar(state, duracao):
+            coletor.registrar("no", nome, duracao)
+            agente_no = agente or state.get("current_agricultor_id")
+            if agente_no: coletor.registrar("agente", agente_no, duracao)
+
+        if inspect.iscoroutinefunction(funcao):
+            @functools.wraps(funcao)
+            async def envoltorio_async(state, *args, **kwargs):
+                inicio = time.perf_counter()
+                try:
+                    return await funcao(state, *args, **kwargs)
+                finally:
+                    _registrar(state, time.perf_counter() - inicio)
+            return envoltorio_async
+
+        @functools.wraps(funcao)
+        def envoltorio(state, *args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(state, *args, **kwargs)
+            finally:
+                _registrar(state, time.perf_counter() - inicio)
+        return envoltorio
+    return decorador
+
+
+class CallbackInstrumentacao(BaseCallbackHandler):
+    """
+    Mede chamadas ao LLM e às ferramentas. O agente vem de `metadata["agente"]`, passado no config
+    de cada `invoke` e herdado pelas execuções filhas.
+    """
+    def __init__(self, instrumentacao: Instrumentacao = None):
+        self.instrumentacao = instrumentacao or coletor
+        self._abertas = {}
+        self._trava = threading.Lock()
+
+    def _abrir(self, run_id, categoria: str, nome: str, metadata: dict):
+        with self._trava:
+            self._abertas[run_id] = (categoria, nome, (metadata or {}).get("agente"), time.perf_counter())
+
+    def _fechar(self, run_id, **contadores):
+        with self._trava:
+            aberta = self._abertas.pop(run_id, None)
+        if not aberta: return
+        categoria, nome, agente, inicio = aberta
+        duracao = time.perf_counter() - inicio
+        self.instrumentacao.registrar(categoria, nome, duracao, **contadores)
+        if agente: self.instrumentacao.registrar("agente", f"{agente}/{categoria}", duracao, **contadores)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._abrir(run_id, "llm", (serialized or {}).get("name") or "llm", metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._abrir(run_id, "llm", (serialized or {}).get("name") or "llm", metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        uso = (response.llm_output or {}).get("token_usage") or {}
+        if not uso and response.generations and response.generations[0]:
+            mensagem = getattr(response.generations[0][0], "message", None)
+            metadados = getattr(mensagem, "usage_metadata", None) or {}
+            uso = {"prompt_tokens": metadados.get("input_tokens", 0),
+                   "completion_tokens": metadados.get("output_tokens", 0)}
+        self._fechar(run_id, tokens_prompt=uso.get("prompt_tokens") or 0,
+                     tokens_completacao=uso.get("completion_tokens") or 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._fechar(run_id, erros=1)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, **kwargs):
+        nome = (serialized or {}).get("name") or kwargs.get("name") or "ferramenta"
+        self._abrir(run_id, "ferramenta", nome, metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        with self._trava:
+            aberta = self._abertas.get(run_id)
+        self._fechar(run_id, erros_parsing=int(bool(aberta) and aberta[1] == _FERRAMENTA_ERRO_PARSING))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._fechar(run_id, erros=1)
+
+
+def _registrar_requisicao(request):
+    tentativa = int(request.headers.get(_CABECALHO_TENTATIVA) or 0)
+    coletor.registrar("llm", "requisicao_http", retries=int(tentativa > 0))
+
+
+async def _registrar_requisicao_async(request):
+    _registrar_requisicao(request)
+
+
+def clientes_http_instrumentados() -> dict:
+    """
+    `http_client`/`http_async_client` para o ChatOpenAI que contam cada requisição ao servidor em
+    ("llm", "requisicao_http"). Os retries do SDK não passam pelos callbacks do LangChain; aqui eles aparecem.
+    """
+    return {"http_client": DefaultHttpxClient(event_hooks={"request": [_registrar_requisicao]}),
+            "http_async_client": DefaultAsyncHttpxClient(event_hooks={"request": [_registrar_requisicao_async]})}
@@ -0,0 +1,188 @@
+# livro_transacoes.py
+
+import bisect
+import os
+import numpy as np
+
+# Colunas do livro e seus tipos. Comprador/vendedor e item guardam ids internados (ver `participantes`/`itens`).
+COLUNAS = {"passo": np.int64, "temporada": np.int32, "comprador": np.int32, "vendedor": np.int32,
+           "item": np.int32, "quantidade": np.int32, "preco_total": np.float64}
+_CAPACIDADE_INICIAL = 1024
+
+
+class LivroTransacoes:
+    """
+    Livro de transações em colunas tipadas, no lugar de uma lista de dicts. O bloco em memória cresce até
+    `limite_memoria` linhas e então é congelado como um segmento; com `diretorio`, o segmento é gravado em
+    arquivos .npy e reaberto por memory-map, tirando-o da RAM. Receita, quantidade e número de vendas por
+    item são acumulados a cada transação, sem varrer o livro.
+    Para o resto do código continua parecendo uma lista: `len`, iteração, índices e fatias devolvem dicts.
+    """
+    def __init__(self, diretorio: str = None, limite_memoria: int = 100_000):
+        if limite_memoria < 1: raise ValueError(f"limite_memoria deve ser >= 1 (recebido: {limite_memoria}).")
+        self.diretorio = diretorio
+        self.limite_memoria = limite_memoria
+        if diretorio: os.makedirs(diretorio, exist_ok=True)
+        self.participantes, self._id_participante = [], {}
+        self.itens, self._id_item = [], {}
+        self.precos_tabela = {}
+        self._segmentos = []
+        self._inicio_segmentos = []
+        self._linhas_congeladas = 0
+        self._novo_bloco()
+        # Agregados por id de item.
+        self._receita_item, self._quantidade_item, self._transacoes_item = [], [], []
+
+    def _novo_bloco(self):
+        capacidade = min(_CAPACIDADE_INICIAL, self.limite_memoria)
+        self._bloco = {nome: np.empty(capacidade, dtype=tipo) for nome, tipo in COLUNAS.items()}
+        self._tamanho_bloco = 0
+
+    def _internar_participante(self, nome: str) -> int:
+        codigo = self._id_participante.get(nome)
+        if codigo is None:
+            codigo = self._id_participante[nome] = len(self.participantes)
+            self.participantes.append(nome)
+        return codigo
+
+    def _internar_item(self, nome: str) -> int:
+        codigo = self._id_item.get(nome)
+        if codigo is None:
+            codigo = self._id_item[nome] = len(self.itens)
+            self.itens.append(nome)
+            self._receita_item.append(0.0)
+            self._quantidade_item.append(0)
+            self._transacoes_item.append(0)
+        return codigo
+
+    def definir_precos_tabela(self, precos: dict):
+        """Preço unitário de tabela por item, usado em `preco_medio_vs_tabela`."""
+        self.precos_tabela = dict(precos)
+
+    def reservar(self, n: int = 1):
+        """
+        Garante espaço no bloco para `n` registros seguidos, congelando ou crescendo o bloco agora. Depois
+        disso os `n` registros só escrevem em memória, então uma cesta não fica registrada pela metade.
+        """
+        if len(self._bloco["passo"]) - self._tamanho_bloco >= n: return
+        if self._tamanho_bloco and self._tamanho_bloco + n > self.limite_memoria: self._congelar_bloco()
+        if len(self._bloco["passo"]) - self._tamanho_bloco >= n: return
+        capacidade = max(self._tamanho_bloco + n, min(2 * self._tamanho_bloco, self.limite_memoria))
+        self._bloco = {nome: np.resize(coluna, capacidade) for nome, coluna in self._bloco.items()}
+
+    def registrar(self, transacao: dict):
+        self.reservar(1)
+        comprador = self._internar_participante(transacao["comprador"])
+        item = self._internar_item(transacao["item"])
+        quantidade, preco_total = transacao.get("quantidade", 1), transacao["preco_total"]
+        i, bloco = self._tamanho_bloco, self._bloco
+        bloco["passo"][i] = transacao.get("passo", 0)
+        bloco["temporada"][i] = transacao.get("temporada", 1)
+        bloco["comprador"][i] = comprador
+        bloco["vendedor"][i] = self._internar_participante(transacao.get("vendedor", "Empresario"))
+        bloco["item"][i] = item
+        bloco["quantidade"][i] = quantidade
+        bloco["preco_total"][i] = preco_total
+        self._tamanho_bloco += 1
+
+        self._receita_item[item] += preco_total
+        self._quantidade_item[item] += quantidade
+        self._transacoes_item[item] += 1
+
+    append = registrar
+
+    def estender(self, transacoes):
+        for transacao in transacoes: self.registrar(transacao)
+
+    def _congelar_bloco(self):
+        segmento = {nome: coluna[:self._tamanho_bloco] for nome, coluna in self._bloco.items()}
+        if self.diretorio:
+            numero = len(self._segmentos)
+            for nome, coluna in segmento.items():
+                caminho = os.path.join(self.diretorio, f"segmento{numero:05d}_{nome}.npy")
+                np.save(caminho, coluna)
+                segmento[nome] = np.load(caminho, mmap_mode="r")
+        self._segmentos.append(segmento)
+        self._inicio_segmentos.append(self._linhas_congeladas)
+        self._linhas_congeladas += self._tamanho_bloco
+        self._novo_bloco()
+
+    def __len__(self):
+        return self._linhas_congeladas + self._tamanho_bloco
+
+    def partes(self, coluna: str) -> list:
+        """Arrays (sem cópia) da coluna em cada segmento, mais o bloco em memória."""
+        return [s[coluna] for s in self._segmentos] + [self._bloco[coluna][:self._tamanho_bloco]]
+
+    def coluna(self, nome: str) -> np.ndarray:
+        partes = self.partes(nome)
+        return partes[0] if len(partes) == 1 else np.concatenate(partes)
+
+    def _linha(self, i: int) -> dict:
+        if i >= self._linhas_congeladas:
+            colunas, j = self._bloco, i - self._linhas_congeladas
+        else:
+            k = bisect.bisect_right(self._inicio_segmentos, i) - 1
+            colunas, j = self._segmentos[k], i - self._inicio_segmentos[k]
+        return {"comprador": self.participantes[colunas["comprador"][j]],
+                "vendedor": self.participantes[colunas["vendedor"][j]],
+                "item": self.itens[colunas["item"][j]],
+                "quantidade": int(colunas["quantidade"][j]),
+                "preco_total": float(colunas["preco_total"][j]),
+                "temporada": int(colunas["temporada"][j]),
+                "passo": int(colunas["passo"][j])}
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice): return [self._linha(i) for i in range(*indice.indices(len(self)))]
+        if indice < 0: indice += len(self)
+        if not 0 <= indice < len(self): raise IndexError("índice fora do livro de transações")
+        return self._linha(indice)
+
+    def __iter__(self):
+        for i in range(len(self)): yield self._linha(i)
+
+    def receita_por_item(self) -> dict:
+        return dict(zip(self.itens, self._receita_item))
+
+    def preco_medio_vs_tabela(self) -> dict:
+        """Por item: preço unitário médio negociado, preço de tabela e a razão entre os dois."""
+        resultado = {}
+        for item, receita, quantidade, n in zip(self.itens, self._receita_item, self._quantidade_item,
+                                                self._transacoes_item):
+            medio = receita / quantidade if quantidade else 0.0
+            tabela = self.precos_tabela.get(item)
+            resultado[item] = {"transacoes": n, "quantidade": quantidade, "preco_medio": medio, "preco_tabela": tabela,
+                               "razao_tabela": medio / tabela if tabela else None}
+        return resultado
+
+    def para_arrow(self):
+        """
+        Tabela pyarrow sem copiar as colunas numéricas (um chunk por segmento); comprador, vendedor e item
+        saem como colunas dictionary-encoded sobre os mesmos ids. Requer `pyarrow`.
+        """
+        import pyarrow as pa
+        dicionarios = {"comprador": pa.array(self.participantes, pa.string()),
+                       "vendedor": pa.array(self.participantes, pa.string()),
+                       "item": pa.array(self.itens, pa.string())}
+        colunas = {}
+        for nome in COLUNAS:
+            partes = [np.asarray(p) for p in self.partes(nome)]
+            if nome in dicionarios:
+                colunas[nome] = pa.chunked_array([pa.DictionaryArray.from_arrays(p, dicionarios[nome]) for p in partes])
+            else:
+                colunas[nome] = pa.chunked_array([pa.array(p) for p in partes])
+        return pa.table(colunas)
+
+    def exportar_parquet(self, caminho: str):
+        import pyarrow.parquet as pq
+        pq.write_table(self.para_arrow(), caminho)
+
+    def resumo(self) -> str:
+        linhas = [f"[Livro de transações] {len(self)} transações em {len(self._segmentos)} segmento(s) congelado(s)"
+                  f"{' (em ' + self.diretorio + ')' if self.diretorio else ''}"]
+        for item, dados in sorted(self.preco_medio_vs_tabela().items()):
+            razao = f"{dados['razao_tabela']:.2f}x tabela" if dados["razao_tabela"] is not None else "sem tabela"
+            linhas.append(f"  - {item}: {dados['transacoes']} vendas, {dados['quantidade']} un., "
+                          f"receita R${self._receita_item[self._id_item[item]]:.2f}, "
+                          f"preço médio R${dados['preco_medio']:.2f} ({razao})")
+        return "\n".join(linhas)
@@ -0,0 +1,171 @@
+# lote.py
+
+"""
+Execução em lote (Monte Carlo) de simulações independentes em um pool de processos. Cada cenário
+define dinheiro e parcelas dos agricultores, catálogo de preços e o roteiro do modelo; cada processo roda
+seus cenários com estado próprio e os resultados são combinados no fim. O modelo de cada cenário vem de
+uma fábrica (`fabrica_modelo`); a padrão, e a única da linha de comando, é o modelo roteirizado do
+benchmark, sem LLM.
+
+Uso: python lote.py --varredura 1000 --agricultores 5 --saida lote.json
+     python lote.py --cenarios cenarios.json --processos 8
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from benchmark import ModeloRoteirizado
+from estado import SimulacaoEstado
+from estado_compacto import SimulacaoEstadoCompacto
+from ferramentas import CATALOGO_PADRAO
+from politica import PoliticaEmpresario
+from temporadas import RegrasTemporada
+from instrumentacao import coletor
+import argparse
+import contextlib
+import functools
+import json
+import os
+import random
+import time
+import traceback
+import numpy as np
+import simulacao
+
+# Métricas de cada cenário resumidas (média, desvio, mín., máx.) em `combinar_resultados`.
+METRICAS = ("dinheiro_empresario", "dinheiro_agricultores", "produtividade_total", "poluicao_total",
+            "transacoes", "parcelas_plantadas", "tempo_s")
+
+
+def gerar_cenarios(n: int, semente: int = 0, n_agricultores: int = 5, parcelas: int = 2,
+                   variacao_precos: float = 0.3, temporadas: int = 1) -> list:
+    """Sorteia `n` cenários: dinheiro dos agricultores, preços (± variacao_precos) e o roteiro do modelo."""
+    rng = random.Random(semente)
+    cenarios = []
+    for k in range(n):
+        catalogo = {categoria: {item: round(preco * rng.uniform(1 - variacao_precos, 1 + variacao_precos), 2)
+                                for item, preco in itens.items()}
+                    for categoria, itens in CATALOGO_PADRAO.items()}
+        cenarios.append({
+            "nome": f"cenario{k}",
+            "agricultores": {f"Agr{i + 1}": {"dinheiro": round(rng.uniform(200.0, 2000.0), 2),
+                                             "parcelas": [f"P{j + 1}" for j in range(parcelas)]}
+                             for i in range(n_agricultores)},
+            "catalogo": catalogo,
+            "temporadas": temporadas,
+            "desconto": round(rng.uniform(0.6, 1.0), 3),
+            "limite_aceite": round(rng.uniform(0.8, 1.0), 3),
+        })
+    return cenarios
+
+
+def modelo_roteirizado(cenario: dict, estado: SimulacaoEstado) -> ModeloRoteirizado:
+    """Fábrica padrão: o modelo roteirizado do benchmark, com o desconto e o limite de aceite do cenário."""
+    return ModeloRoteirizado(estado=estado, desconto=cenario.get("desconto", 0.8),
+                             limite_aceite=cenario.get("limite_aceite", 0.9))
+
+
+def executar_cenario(cenario: dict, fabrica_modelo=modelo_roteirizado) -> dict:
+    """
+    Roda um cenário completo com o modelo de `fabrica_modelo(cenario, estado)` e devolve suas métricas.
+    Erros viram um resultado com a chave "erro", para não derrubar o lote inteiro.
+    """
+    nome = cenario.get("nome")
+    try:
+        coletor.reiniciar()
+        politica = PoliticaEmpresario(*cenario.get("fatores_politica", (1.0, 0.5)))
+        classe_estado = SimulacaoEstadoCompacto if cenario.get("estado_compacto") else SimulacaoEstado
+        estado = classe_estado(cenario.get("dinheiro_empresario", 10000.0), cenario["agricultores"])
+        modelo = fabrica_modelo(cenario, estado)
+
+        inicio = time.perf_counter()
+        with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+            est = simulacao.inicializar_simulacao(cenario["agricultores"], politica=politica, modelo=modelo,
+                                                  estado=estado, catalogo=cenario.get("catalogo"),
+                                                  regras=RegrasTemporada(**cenario.get("regras", {})))
+            simulacao.executar_simulacao(est, n_temporadas=cenario.get("temporadas", 1))
+        duracao = time.perf_counter() - inicio
+
+        agricultores = {agr_id: est.agricultor_como_dict(agr_id) for agr_id in est.agricultores}
+        return {"nome": nome,
+                "dinheiro_empresario": est.dinheiro_empresario,
+                "dinheiro_agricultores": sum(a["dinheiro"] for a in agricultores.values()),
+                "produtividade_total": sum(a["produtividade_total"] for a in agricultores.values()),
+                "poluicao_total": sum(a["poluicao_gerada"] for a in agricultores.values()),
+                "transacoes": len(est.transacoes_registradas),
+                "parcelas_plantadas": sum(t["plantios"] for t in est.historico_temporadas),
+                "tempo_s": duracao,
+                "receita_por_item": est.transacoes_registradas.receita_por_item(),
+                "temporadas": est.historico_temporadas,
+                "agricultores": agricultores}
+    except Exception:
+        return {"nome": nome, "erro": traceback.format_exc()}
+
+
+def combinar_resultados(resultados: list) -> dict:
+    validos = [r for r in resultados if "erro" not in r]
+    estatisticas = {}
+    for metrica in METRICAS:
+        valores = np.array([r[metrica] for r in validos], dtype=np.float64)
+        if valores.size:
+            estatisticas[metrica] = {"media": float(valores.mean()), "desvio": float(valores.std()),
+                                     "min": float(valores.min()), "max": float(valores.max())}
+    receita_por_item = {}
+    for r in validos:
+        for item, receita in r["receita_por_item"].items():
+            receita_por_item[item] = receita_por_item.get(item, 0.0) + receita
+    return {"cenarios": len(resultados), "concluidos": len(validos),
+            "falhas": [{"nome": r["nome"], "erro": r["erro"]} for r in resultados if "erro" in r],
+            "estatisticas": estatisticas, "receita_por_item": receita_por_item, "resultados": resultados}
+
+
+def executar_lote(cenarios: list, processos: int = None, fabrica_modelo=modelo_roteirizado) -> dict:
+    """
+    Distribui os cenários entre `processos` processos (padrão: todos os núcleos) e combina os resultados.
+    `fabrica_modelo` precisa ser uma função de módulo, para chegar aos processos por pickle.
+    """
+    processos = processos or os.cpu_count() or 1
+    executar = functools.partial(executar_cenario, fabrica_modelo=fabrica_modelo)
+    if processos == 1:
+        resultados = [executar(c) for c in cenarios]
+    else:
+        # Lotes de cenários por tarefa diluem o custo de enviar cada cenário ao processo.
+        tamanho_bloco = max(1, len(cenarios) // (processos * 4))
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            resultados = list(pool.map(executar, cenarios, chunksize=tamanho_bloco))
+    return combinar_resultados(resultados)
+
+
+def _tabela(combinado: dict) -> str:
+    linhas = [f"{combinado['concluidos']}/{combinado['cenarios']} cenários concluídos",
+              f"{'métrica':<24}{'média':>12}{'desvio':>12}{'mín.':>12}{'máx.':>12}"]
+    for metrica, e in combinado["estatisticas"].items():
+        linhas.append(f"{metrica:<24}{e['media']:>12.2f}{e['desvio']:>12.2f}{e['min']:>12.2f}{e['max']:>12.2f}")
+    return "\n".join(linhas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Execução em lote de cenários independentes da simulação, com o "
+                                                 "modelo roteirizado do benchmark (sem LLM).")
+    parser.add_argument("--cenarios", default=None, help="Arquivo JSON com a lista de cenários.")
+    parser.add_argument("--varredura", type=int, default=100, help="Sem --cenarios: número de cenários sorteados.")
+    parser.add_argument("--semente", type=int, default=0, help="Semente do sorteio dos cenários.")
+    parser.add_argument("--agricultores", type=int, default=5, help="Agricultores por cenário sorteado.")
+    parser.add_argument("--temporadas", type=int, default=1, help="Temporadas por cenário sorteado.")
+    parser.add_argument("--processos", type=int, default=None, help="Processos do pool (padrão: todos os núcleos).")
+    parser.add_argument("--saida", default=None, help="Grava os resultados combinados em JSON neste arquivo.")
+    args = parser.parse_args()
+
+    if args.cenarios:
+        with open(args.cenarios, encoding="utf-8") as f:
+            cenarios = json.load(f)
+    else:
+        cenarios = gerar_cenarios(args.varredura, args.semente, args.agricultores, temporadas=args.temporadas)
+    inicio = time.perf_counter()
+    combinado = executar_lote(cenarios, args.processos)
+    print(_tabela(combinado))
+    print(f"Tempo total: {time.perf_counter() - inicio:.2f}s")
+    for falha in combinado["falhas"][:5]:
+        print(f"\n[FALHA] {falha['nome']}:\n{falha['erro']}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(combinado, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados salvos em '{args.saida}'")
@@ -0,0 +1,182 @@
+# modelo_streaming.py
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from historico import estimar_tokens
+from instrumentacao import coletor
+from typing import Any
+import eventos
+import json
+import time
+
+ABRE_THINK, FECHA_THINK = "<think>", "</think>"
+# Pedido extra quando o raciocínio passa do limite: a chamada é refeita uma vez com ele no fim do prompt.
+AVISO_LIMITE_RACIOCINIO = ("Limite de raciocínio atingido. Responda AGORA com exatamente uma chamada de "
+                           "ferramenta, sem raciocinar.")
+
+
+def _prefixo_pendente(texto: str, marcador: str) -> int:
+    """Tamanho do maior sufixo de `texto` que é início de `marcador` (uma tag cortada entre fragmentos)."""
+    for n in range(min(len(texto), len(marcador) - 1), 0, -1):
+        if marcador.startswith(texto[-n:]): return n
+    return 0
+
+
+class FiltroThink:
+    """
+    Remove blocos <think>...</think> de um texto que chega em fragmentos. Também trata o caso em que o
+    modelo omite o <think> de abertura: o que vem antes de um </think> solto é descartado (e contado) como
+    raciocínio.
+    """
+    def __init__(self):
+        self.dentro = False
+        self.visivel = ""
+        self.fragmentos_raciocinio = 0
+        self._fragmentos_fora = 0
+        self._pendente = ""
+
+    def alimentar(self, fragmento: str):
+        if self.dentro: self.fragmentos_raciocinio += 1
+        else: self._fragmentos_fora += 1
+        texto, self._pendente = self._pendente + fragmento, ""
+        while texto:
+            if self.dentro:
+                fim = texto.find(FECHA_THINK)
+                if fim < 0:
+                    n = _prefixo_pendente(texto, FECHA_THINK)
+                    self._pendente = texto[len(texto) - n:] if n else ""
+                    return
+                self.dentro, texto = False, texto[fim + len(FECHA_THINK):]
+                continue
+            inicio, fim = texto.find(ABRE_THINK), texto.find(FECHA_THINK)
+            if fim >= 0 and (inicio < 0 or fim < inicio):
+                self.fragmentos_raciocinio, self._fragmentos_fora = self.fragmentos_raciocinio + self._fragmentos_fora, 0
+                self.visivel, texto = "", texto[fim + len(FECHA_THINK):]
+                continue
+            if inicio >= 0:
+                self.visivel += texto[:inicio]
+                self.dentro, texto = True, texto[inicio + len(ABRE_THINK):]
+                continue
+            n = max(_prefixo_pendente(texto, ABRE_THINK), _prefixo_pendente(texto, FECHA_THINK))
+            self.visivel += texto[:len(texto) - n]
+            self._pendente = texto[len(texto) - n:] if n else ""
+            return
+
+    def finalizar(self):
+        """Fim do stream: o que ficou retido por parecer o início de uma tag é texto visível (ou raciocínio)."""
+        if not self.dentro: self.visivel += self._pendente
+        self._pendente = ""
+
+
+class _LeitorStream:
+    """Consome os fragmentos de uma resposta e diz quando parar: primeira ferramenta completa ou limite de raciocínio."""
+    def __init__(self, limite_raciocinio: int = None):
+        self.limite_raciocinio = limite_raciocinio
+        self.filtro = FiltroThink()
+        self.acumulado = None
+        self.fragmentos = 0
+        self.chamada = None
+        self.estourou_raciocinio = False
+
+    def alimentar(self, fragmento) -> bool:
+        if not isinstance(fragmento, AIMessageChunk):
+            # Modelos sem streaming (ex.: o roteirizado do benchmark) devolvem a mensagem inteira de uma vez.
+            fragmento = AIMessageChunk(content=fragmento.content, tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                for i, tc in enumerate(getattr(fragmento, "tool_calls", []))])
+        self.fragmentos += 1
+        if isinstance(fragmento.content, str) and fragmento.content: self.filtro.alimentar(fragmento.content)
+        self.acumulado = fragmento if self.acumulado is None else self.acumulado + fragmento
+        self.chamada = self._primeira_chamada_completa()
+        if self.chamada: return True
+        if self.limite_raciocinio is not None and self.filtro.fragmentos_raciocinio > self.limite_raciocinio:
+            self.estourou_raciocinio = True
+            return True
+        return False
+
+    def _primeira_chamada_completa(self):
+        for parcial in self.acumulado.tool_call_chunks:
+            if not parcial.get("name"): continue
+            try:
+                argumentos = json.loads(parcial.get("args") or "")
+            except json.JSONDecodeError:
+                continue
+            if isinstance(argumentos, dict):
+                return {"name": parcial["name"], "args": argumentos, "id": parcial.get("id") or f"call_{self.fragmentos}"}
+        return None
+
+    def mensagem(self) -> AIMessage:
+        self.filtro.finalizar()
+        if self.chamada: return AIMessage(content=self.filtro.visivel, tool_calls=[self.chamada])
+        # Stream terminado sem cortar: as chamadas (se houver) já estão completas no acumulado.
+        chamadas = self.acumulado.tool_calls[:1] if self.acumulado is not None else []
+        return AIMessage(content=self.filtro.visivel, tool_calls=chamadas)
+
+
+class ModeloStreaming(BaseChatModel):
+    """
+    Envolve um modelo de chat e consome a resposta em streaming: os blocos <think> são descartados enquanto
+    chegam e a geração é interrompida assim que a primeira chamada de ferramenta está completa (os prompts
+    pedem exatamente uma). Com `limite_raciocinio`, um raciocínio com mais fragmentos (~tokens) que isso é
+    cortado e a chamada é refeita uma vez pedindo a ação direto. O tempo até a primeira ação de cada chamada
+    vai para o coletor de instrumentação ("llm/primeira_acao" e "<agente>/primeira_acao").
+    """
+    modelo: BaseChatModel
+    limite_raciocinio: int | None = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "streaming"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"modelo": self.modelo._llm_type, **self.modelo._identifying_params,
+                "limite_raciocinio": self.limite_raciocinio}
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        inicio, mensagens = time.perf_counter(), list(messages)
+        for tentativa in range(2):
+            leitor = _LeitorStream(self.limite_raciocinio if tentativa == 0 else None)
+            stream = self.modelo.stream(mensagens, stop=stop, **kwargs)
+            try:
+                for fragmento in stream:
+                    if leitor.alimentar(fragmento): break
+            finally:
+                stream.close()
+            if not leitor.estourou_raciocinio: break
+            mensagens = mensagens + [HumanMessage(content=AVISO_LIMITE_RACIOCINIO)]
+        return self._resultado(leitor, messages, time.perf_counter() - inicio, tentativa, run_manager)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        inicio, mensagens = time.perf_counter(), list(messages)
+        for tentativa in range(2):
+            leitor = _LeitorStream(self.limite_raciocinio if tentativa == 0 else None)
+            stream = self.modelo.astream(mensagens, stop=stop, **kwargs)
+            try:
+                async for fragmento in stream:
+                    if leitor.alimentar(fragmento): break
+            finally:
+                await stream.aclose()
+            if not leitor.estourou_raciocinio: break
+            mensagens = mensagens + [HumanMessage(content=AVISO_LIMITE_RACIOCINIO)]
+        return self._resultado(leitor, messages, time.perf_counter() - inicio, tentativa, run_manager)
+
+    def _resultado(self, leitor: _LeitorStream, messages, duracao: float, refeitas: int, run_manager: Any) -> ChatResult:
+        mensagem = leitor.mensagem()
+        agente = (getattr(run_manager, "metadata", None) or {}).get("agente")
+        coletor.registrar("llm", "primeira_acao", duracao)
+        if agente: coletor.registrar("agente", f"{agente}/primeira_acao", duracao)
+        eventos.emitir("primeira_acao", agente=agente, duracao=duracao, fragmentos=leitor.fragmentos,
+                       fragmentos_raciocinio=leitor.filtro.fragmentos_raciocinio, cortada=leitor.chamada is not None,
+                       refeita=bool(refeitas))
+        # Um stream cortado não traz o uso de tokens do servidor; nesse caso vai uma estimativa.
+        metadados = leitor.acumulado.usage_metadata if leitor.acumulado is not None else None
+        uso = {"prompt_tokens": metadados["input_tokens"], "completion_tokens": metadados["output_tokens"]} \
+            if metadados else {"prompt_tokens": sum(estimar_tokens(str(m.content)) for m in messages),
+                               "completion_tokens": leitor.fragmentos}
+        return ChatResult(generations=[ChatGeneration(message=mensagem)], llm_output={"token_usage": uso})
@@ -0,0 +1,95 @@
+# plantio.py
+
+import itertools
+import numpy as np
+
+# Regras de produtividade e poluição do plantio, em tabelas indexadas por código. O código 0 de cada
+# insumo opcional é "nenhum"; nomes fora do catálogo caem no código "outro", que reproduz os valores
+# padrão das regras originais (semente desconhecida polui 15, agrotóxico desconhecido polui 50).
+PRODUTIVIDADE_BASE = 50
+SEMENTES = ("soja", "arroz", "hortalica", "outra")
+POLUICAO_SEMENTE = (30, 20, 10, 15)
+MULTIPLICADOR_SEMENTE = (3, 2, 1, 1)
+PACOTES = (None, "pacote1", "pacote2", "pacote3")
+BONUS_PACOTE = (0, 25, 60, 150)
+FERTILIZANTES = (None, "fertilizante-comum", "fertilizante-premium", "fertilizante-super-premium")
+BONUS_FERTILIZANTE = (0, 50, 120, 250)
+AGROTOXICOS = (None, "agrotoxico-comum", "agrotoxico-premium", "agrotoxico-super-premium", "outro")
+BONUS_AGROTOXICO = (0, 200, 500, 1000, 0)
+POLUICAO_AGROTOXICO = (0, 100, 150, 250, 50)
+
+_DIMENSOES = {"semente": SEMENTES, "pacote": PACOTES, "fertilizante": FERTILIZANTES, "agrotoxico": AGROTOXICOS}
+# Código usado para nomes fora do catálogo em cada dimensão.
+_CODIGO_DESCONHECIDO = {"semente": 3, "pacote": 0, "fertilizante": 0, "agrotoxico": 4}
+_CODIGOS = {dim: {nome: i for i, nome in enumerate(nomes) if nome not in ("outra", "outro")}
+            for dim, nomes in _DIMENSOES.items()}
+_FORMATO = (len(SEMENTES), len(PACOTES), len(FERTILIZANTES), len(AGROTOXICOS), 2)
+
+
+def _calcular(semente: int, pacote: int, fertilizante: int, agrotoxico: int, pulverizador: int) -> tuple:
+    produtividade = PRODUTIVIDADE_BASE + BONUS_PACOTE[pacote] + BONUS_FERTILIZANTE[fertilizante]
+    poluicao = POLUICAO_SEMENTE[semente]
+    if agrotoxico:
+        produtividade = (produtividade + BONUS_AGROTOXICO[agrotoxico]) * MULTIPLICADOR_SEMENTE[semente]
+        poluicao += POLUICAO_AGROTOXICO[agrotoxico]
+        # Todos os valores são inteiros e positivos: a divisão inteira equivale a int(poluicao / 2).
+        if pulverizador: poluicao //= 2
+    return produtividade, poluicao
+
+
+# Tabelas pré-calculadas com o resultado de todas as combinações (semente, pacote, fertilizante, agrotóxico,
+# pulverizador). O plantio escalar e o lote leem daqui, então os dois dão sempre o mesmo resultado.
+_RESULTADOS = [_calcular(*c) for c in itertools.product(*(range(n) for n in _FORMATO))]
+TABELA_PRODUTIVIDADE = np.array([p for p, _ in _RESULTADOS], dtype=np.int64).reshape(_FORMATO)
+TABELA_POLUICAO = np.array([p for _, p in _RESULTADOS], dtype=np.int64).reshape(_FORMATO)
+_TABELA_ESCALAR = TABELA_PRODUTIVIDADE.tolist(), TABELA_POLUICAO.tolist()
+
+
+def codigo(dimensao: str, nome) -> int:
+    if not nome: return 0 if dimensao != "semente" else _CODIGO_DESCONHECIDO[dimensao]
+    return _CODIGOS[dimensao].get(nome, _CODIGO_DESCONHECIDO[dimensao])
+
+
+def codificar(dimensao: str, nomes) -> np.ndarray:
+    """Converte uma sequência de nomes de insumos (None = nenhum) em um array de códigos."""
+    return np.fromiter((codigo(dimensao, nome) for nome in nomes), dtype=np.int64)
+
+
+def avaliar_plantio(tipo_semente: str, pacote_maquina: str, tipo_fertilizante: str = None,
+                    tipo_agrotoxico: str = None, pulverizador: bool = False) -> tuple:
+    """Produtividade e poluição (inteiras) de um plantio, pelas mesmas tabelas de `avaliar_lote`."""
+    s, p = codigo("semente", tipo_semente), codigo("pacote", pacote_maquina)
+    f, a, v = codigo("fertilizante", tipo_fertilizante), codigo("agrotoxico", tipo_agrotoxico), int(pulverizador)
+    produtividades, poluicoes = _TABELA_ESCALAR
+    return produtividades[s][p][f][a][v], poluicoes[s][p][f][a][v]
+
+
+def avaliar_lote(sementes, pacotes, fertilizantes=0, agrotoxicos=0, pulverizadores=0) -> tuple:
+    """
+    Versão vetorizada: recebe arrays de códigos (ver `codificar`), com broadcasting do NumPy,
+    e devolve (produtividades, poluicoes) como arrays int64 do mesmo formato.
+    """
+    indice = (np.asarray(sementes), np.asarray(pacotes), np.asarray(fertilizantes), np.asarray(agrotoxicos),
+              np.asarray(pulverizadores, dtype=np.int64))
+    return TABELA_PRODUTIVIDADE[indice], TABELA_POLUICAO[indice]
+
+
+def melhor_plano(inventario: dict, peso_poluicao: float = 0.0):
+    """
+    Escolhe, sem LLM, o plantio viável com o inventário que maximiza produtividade - peso_poluicao * poluicao.
+    Devolve um dict com os argumentos de `plantar_semente` (menos agricultor e parcela), ou None.
+    """
+    sementes = sorted(set(inventario["semente"]))
+    pacotes = sorted({m for m in inventario["maquina_alugada"] if m != "pulverizador"})
+    if not sementes or not pacotes: return None
+    fertilizantes = [None] + sorted(set(inventario["fertilizante"]))
+    pulverizador = "pulverizador" in inventario["maquina_alugada"]
+    agrotoxicos = [None] + (sorted(set(inventario["agrotoxico"])) if pulverizador else [])
+
+    grade = np.meshgrid(codificar("semente", sementes), codificar("pacote", pacotes),
+                        codificar("fertilizante", fertilizantes), codificar("agrotoxico", agrotoxicos), indexing="ij")
+    produtividade, poluicao = avaliar_lote(*grade, pulverizadores=int(pulverizador))
+    s, p, f, a = np.unravel_index(int(np.argmax(produtividade - peso_poluicao * poluicao)), produtividade.shape)
+    return {"tipo_semente": sementes[s], "pacote_maquina": pacotes[p], "tipo_fertilizante": fertilizantes[f],
+            "tipo_agrotoxico": agrotoxicos[a], "produtividade": int(produtividade[s, p, f, a]),
+            "poluicao": int(poluicao[s, p, f, a])}
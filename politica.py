@@ -0,0 +1,54 @@
+# politica.py
+
+from ferramentas import aceitar_oferta, rejeitar_oferta, valor_de_tabela
+from estado import SimulacaoEstado
+
+ACEITAR = "aceitar"
+REJEITAR = "rejeitar"
+NEGOCIAR = "negociar"
+
+
+class PoliticaEmpresario:
+    """
+    Regras determinísticas aplicadas antes do Empresário LLM.
+    Ofertas iguais ou acima da tabela são aceitas, ofertas muito baixas são rejeitadas e apenas
+    as ofertas na faixa "negociável" entre os dois limites seguem para o LLM.
+    """
+    def __init__(self, fator_aceite: float = 1.0, fator_rejeicao: float = 0.5):
+        self.fator_aceite = fator_aceite
+        self.fator_rejeicao = fator_rejeicao
+        self.contadores = {"aceitas": 0, "rejeitadas": 0, "encaminhadas_llm": 0}
+
+    def classificar(self, oferta: dict) -> str:
+        referencia = valor_de_tabela(oferta)
+        # Sem valor de tabela positivo (item desconhecido ou quantidade inválida) não há o que comparar.
+        if referencia is None or referencia <= 0: return REJEITAR
+        if oferta["preco_proposto"] >= self.fator_aceite * referencia: return ACEITAR
+        if oferta["preco_proposto"] < self.fator_rejeicao * referencia: return REJEITAR
+        return NEGOCIAR
+
+    def decidir(self, sim_estado: SimulacaoEstado, agricultor_id: str = None) -> list:
+        """Resolve as ofertas pendentes triviais e devolve as que ainda precisam do LLM."""
+        restantes = []
+        for oferta in sim_estado.ofertas_pendentes(agricultor_id):
+            decisao = self.classificar(oferta)
+            if decisao == ACEITAR:
+                resultado = aceitar_oferta.invoke({"oferta_id": oferta["oferta_id"]})
+                self.contadores["aceitas"] += 1
+            elif decisao == REJEITAR:
+                resultado = rejeitar_oferta.invoke({"oferta_id": oferta["oferta_id"]})
+                self.contadores["rejeitadas"] += 1
+            else:
+                self.contadores["encaminhadas_llm"] += 1
+                restantes.append(oferta)
+                continue
+            print(f"\n[POLÍTICA] {oferta['oferta_id']} decidida sem LLM ({decisao}): {resultado}")
+        return restantes
+
+    def resumo(self) -> str:
+        total = sum(self.contadores.values())
+        curtos = self.contadores["aceitas"] + self.contadores["rejeitadas"]
+        percentual = 100.0 * curtos / total if total else 0.0
+        return (f"Decisões da política: {total} | sem LLM: {curtos} ({percentual:.1f}%) "
+                f"[aceitas={self.contadores['aceitas']}, rejeitadas={self.contadores['rejeitadas']}] | "
+                f"encaminhadas ao LLM: {self.contadores['encaminhadas_llm']}")
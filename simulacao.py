@@ -1,27 +1,104 @@
 # simulacao.py (VERSÃO CORRIGIDA)
 
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from agentes import inicializar_agentes
-from estado import SimulacaoEstado
-from ferramentas import definir_recursos_globais
+from estado import SimulacaoEstado, OFERTA_PENDENTE, OFERTA_CONTRAPROPOSTA, OFERTA_ACEITA, OFERTA_REJEITADA, \
+    descrever_itens
+from estado_compacto import SimulacaoEstadoCompacto
+from ferramentas import definir_recursos
+from politica import PoliticaEmpresario
+from cache_llm import CacheRespostasLLM, MODOS, MODO_DIRETO
+from historico import GerenciadorHistorico, ContadorTokensPrompt
+from eventos import RegistroEventos, CallbackEventos, NIVEIS, definir_registro, registrar_no, emitir
+from instrumentacao import CallbackInstrumentacao, clientes_http_instrumentados, coletor, medir_no, medir_funcao
+from checkpoint import ArmazemCheckpoints
+from livro_transacoes import LivroTransacoes
+from temporadas import RegrasTemporada, encerrar_temporada
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+from typing import Annotated
+import argparse
+import asyncio
+import functools
+import importlib.util
+import inspect
+import operator
 import re
 import sys
 
+MAX_ITERACOES_NEGOCIACAO = 10
+# Limite padrão de negociações simultâneas, para não sobrecarregar o servidor local do LLM.
+MAX_NEGOCIACOES_CONCORRENTES = 4
+# No modo concorrente, ofertas que chegam dentro desta janela (s) são respondidas em uma só chamada do Empresário.
+JANELA_LOTE_EMPRESARIO = 0.05
+
 
 class Tee:
     def __init__(self, *files):
         self.files = files
 
     def write(self, obj):
-        for f in self.files: f.write(obj); f.flush()
+        for f in self.files: f.write(obj)
 
     def flush(self):
         for f in self.files: f.flush()
 
 
-llm = ChatOpenAI(model="local-model", openai_api_base="http://localhost:1234/v1", temperature=0.0, api_key="lm-studio")
+class RelatorioPassos:
+    """
+    A cada passo, imprime e emite (evento "delta_estado_passo") só o que mudou no estado da simulação, lido do
+    diário de alterações; o estado completo só é impresso a cada `intervalo_completo` passos (0 = nunca).
+    """
+    def __init__(self, intervalo_completo: int = 0):
+        self.intervalo_completo = intervalo_completo
+        self.passos = 0
+        self._estado = None
+        self._alteracoes = None
+
+    def relatar(self, sim_estado: SimulacaoEstado):
+        if sim_estado is not self._estado:
+            if self._estado is not None: self._estado.deixar_de_observar(self._alteracoes)
+            self._estado, self._alteracoes = sim_estado, sim_estado.observar()
+        self.passos += 1
+        resumo = sim_estado.resumir_alteracoes(self._alteracoes.consumir())
+        if resumo:
+            print(f"\n[ALTERAÇÕES] {_descrever_alteracoes(resumo)}")
+            emitir("delta_estado_passo", passo=sim_estado.passo_atual, **resumo)
+        if self.intervalo_completo and self.passos % self.intervalo_completo == 0: print(sim_estado)
+
+
+def _descrever_alteracoes(resumo: dict) -> str:
+    partes = []
+    for agr_id, campos in resumo.get("agricultores", {}).items():
+        valores = []
+        for campo, valor in campos.items():
+            if campo == "inventario": valor = {categoria: itens for categoria, itens in valor.items() if itens}
+            elif isinstance(valor, float): valor = f"{valor:.2f}"
+            valores.append(f"{campo}={valor}")
+        partes.append(f"{agr_id}: {', '.join(valores)}")
+    if "ofertas" in resumo:
+        partes.append("ofertas: " + ", ".join(f"{oferta_id} {status}" for oferta_id, status in resumo["ofertas"].items()))
+    if "dinheiro_empresario" in resumo: partes.append(f"empresário: R${resumo['dinheiro_empresario']:.2f}")
+    return " | ".join(partes)
+
+
+def criar_llm(cache: CacheRespostasLLM = None) -> ChatOpenAI:
+    # stream_usage: sem ele, um stream completo não traz o uso de tokens do servidor.
+    return ChatOpenAI(model="local-model", openai_api_base="http://localhost:1234/v1", temperature=0.0,
+                      api_key="lm-studio", cache=cache, stream_usage=True, **clientes_http_instrumentados())
+
+
+llm = criar_llm()
+agentes = {}
+# Pré-filtro determinístico das ofertas do Empresário; None desativa e envia tudo ao LLM.
+politica_empresario = None
+gerenciador_historico = GerenciadorHistorico()
+regras_temporada = RegrasTemporada()
+contador_tokens = ContadorTokensPrompt()
+callbacks_agentes = [contador_tokens, CallbackEventos(), CallbackInstrumentacao()]
+# Por passo só as alterações do estado; o despejo completo é caro e só sai a cada N passos (--despejo-estado N).
+relatorio_passos = RelatorioPassos()
 
 
 class GraphState(dict):
@@ -32,69 +109,221 @@ class GraphState(dict):
     negociacao_ativa: bool
     next_action: str = ""
     iteracoes_negociacao: int = 0
+    n_temporadas: int = 1
+    ultimo_no: str = ""
+    negociacoes_concluidas: Annotated[list, operator.add]
+
+
+def _config_agente(agente: str) -> dict:
+    return {"callbacks": callbacks_agentes, "metadata": {"agente": agente}}
+
+
+def _contar_passo(funcao):
+    """Avança `SimulacaoEstado.passo_atual` antes de cada nó; as transações feitas no nó levam esse passo."""
+    if inspect.iscoroutinefunction(funcao):
+        @functools.wraps(funcao)
+        async def envoltorio_async(state, *args, **kwargs):
+            state["simulacao_estado"].avancar_passo()
+            return await funcao(state, *args, **kwargs)
+        return envoltorio_async
 
+    @functools.wraps(funcao)
+    def envoltorio(state, *args, **kwargs):
+        state["simulacao_estado"].avancar_passo()
+        return funcao(state, *args, **kwargs)
+    return envoltorio
 
+
+def _no(nome: str, funcao, agente: str = None):
+    return registrar_no(nome)(medir_no(nome, agente)(_contar_passo(funcao)))
+
+
+@medir_funcao("_limpar_saida_agente")
 def _limpar_saida_agente(texto_original: str) -> str:
     match = re.search(r"</think>(.*)", texto_original, re.DOTALL)
     if match: return match.group(1).strip()
     return texto_original.strip()
 
 
-def empresario_node(state: GraphState):
-    sim_estado = state["simulacao_estado"]
+def _descrever_ofertas(ofertas: list) -> str:
+    return "\n".join(f"- {o['oferta_id']}: {o['agricultor_id']} quer {descrever_itens(o)} "
+                     f"por R${o['preco_proposto']:.2f}" for o in ofertas)
+
+
+def _entrada_empresario(state: GraphState) -> str:
     agr_id = state["current_agricultor_id"]
-    oferta = sim_estado.negociacao_em_andamento
-    input_text = (
-        f"Sua vez de negociar com o Agricultor '{agr_id}'. A oferta atual é: {oferta}. Avalie e decida (aceitar, rejeitar, ou contrapropor).")
+    ofertas = state["simulacao_estado"].ofertas_pendentes(agr_id)
+    return (
+        f"Sua vez de negociar com o Agricultor '{agr_id}'. Ofertas pendentes:\n{_descrever_ofertas(ofertas)}\nAvalie e decida (aceitar, rejeitar, ou contrapropor) usando o oferta_id.")
 
-    executor = agentes["Empresario"]
-    result = executor.invoke({"input": input_text, "chat_history": state["messages"]})
-    resp_limpa = _limpar_saida_agente(result.get("output", ""))
 
+def _entrada_empresario_lote(ofertas: list) -> str:
+    return (
+        f"Há {len(ofertas)} ofertas pendentes de agricultores diferentes:\n{_descrever_ofertas(ofertas)}\n"
+        f"Responda TODAS em uma única chamada de `responder_ofertas`, uma decisão por oferta_id.")
+
+
+def _descrever_resposta(oferta: dict) -> str:
+    if oferta["status"] == OFERTA_ACEITA:
+        return f"Oferta {oferta['oferta_id']} ACEITA: compra de {descrever_itens(oferta)} por R${oferta['preco_proposto']:.2f} concluída."
+    if oferta["status"] == OFERTA_REJEITADA:
+        return f"Oferta {oferta['oferta_id']} REJEITADA pelo empresário. A negociação sobre {descrever_itens(oferta)} foi encerrada."
+    if oferta["status"] == OFERTA_CONTRAPROPOSTA:
+        return f"CONTRA-OFERTA na oferta {oferta['oferta_id']}: o empresário pede R${oferta['preco_proposto']:.2f} por {descrever_itens(oferta)}."
+    if oferta["status"] == OFERTA_PENDENTE:
+        return f"O empresário ainda não respondeu a oferta {oferta['oferta_id']}."
+    return f"Oferta {oferta['oferta_id']} encerrada com status '{oferta['status']}'."
+
+
+def _registrar_saida_empresario(state: GraphState, result: dict) -> GraphState:
+    resp_limpa = _limpar_saida_agente(result.get("output", ""))
     state["messages"].append(AIMessage(content=resp_limpa, name="Empresario"))
-    print(f"\n[EMPRESARIO] Responde para {agr_id}: {resp_limpa}")
+    print(f"\n[EMPRESARIO] Responde para {state['current_agricultor_id']}: {resp_limpa}")
     return state
 
 
-def agricultor_node(state: GraphState):
-    agr_id = state["current_agricultor_id"]
+def _entrada_agricultor(state: GraphState) -> str:
     last_message = state["messages"][-1].content if state["messages"] else "Nenhuma mensagem anterior."
-
-    input_text = (
+    return (
         f"O empresário respondeu: '{last_message}'.\nSiga seu algoritmo. Verifique seu inventário, seu plano, e decida sua próxima ação: fazer uma oferta, plantar, ou responder a uma contra-proposta.")
 
-    executor = agentes["Agricultores"][agr_id]
-    result = executor.invoke({"input": input_text, "chat_history": state["messages"]})
-    resp_limpa = _limpar_saida_agente(result.get("output", ""))
 
+def _registrar_saida_agricultor(state: GraphState, result: dict) -> GraphState:
+    agr_id = state["current_agricultor_id"]
+    resp_limpa = _limpar_saida_agente(result.get("output", ""))
     state["messages"].append(AIMessage(content=resp_limpa, name=f"Agricultor {agr_id}"))
     print(f"\n[AGRICULTOR {agr_id}] Ação/Resposta: {resp_limpa}")
     return state
 
 
+def _responder_agricultor(state: GraphState, oferta_id: str) -> GraphState:
+    resposta = _descrever_resposta(state["simulacao_estado"].livro_ofertas[oferta_id]) if oferta_id \
+        else "Não há oferta pendente."
+    state["messages"].append(AIMessage(content=resposta, name="Empresario"))
+    print(f"\n[EMPRESARIO] Responde para {state['current_agricultor_id']}: {resposta}")
+    return state
+
+
+def _resolvido_pela_politica(state: GraphState) -> bool:
+    if politica_empresario is None: return False
+    sim_estado = state["simulacao_estado"]
+    oferta = sim_estado.oferta_aberta_de(state["current_agricultor_id"])
+    if not oferta or politica_empresario.decidir(sim_estado, state["current_agricultor_id"]): return False
+    _responder_agricultor(state, oferta["oferta_id"])
+    return True
+
+
+def _historico(state: GraphState) -> list[BaseMessage]:
+    return gerenciador_historico.montar(state["messages"], state["simulacao_estado"], state["current_agricultor_id"])
+
+
+def empresario_node(state: GraphState):
+    if _resolvido_pela_politica(state): return state
+    executor = agentes["Empresario"]
+    result = executor.invoke({"input": _entrada_empresario(state), "chat_history": _historico(state)},
+                             config=_config_agente("Empresario"))
+    return _registrar_saida_empresario(state, result)
+
+
+def agricultor_node(state: GraphState):
+    executor = agentes["Agricultores"][state["current_agricultor_id"]]
+    result = executor.invoke({"input": _entrada_agricultor(state), "chat_history": _historico(state)},
+                             config=_config_agente(state["current_agricultor_id"]))
+    return _registrar_saida_agricultor(state, result)
+
+
+async def agricultor_node_async(state: GraphState):
+    executor = agentes["Agricultores"][state["current_agricultor_id"]]
+    result = await executor.ainvoke({"input": _entrada_agricultor(state), "chat_history": _historico(state)},
+                                    config=_config_agente(state["current_agricultor_id"]))
+    return _registrar_saida_agricultor(state, result)
+
+
+class MesaEmpresario:
+    """
+    Agrupa as ofertas pendentes das negociações concorrentes e as responde em uma única chamada do Empresário.
+    """
+    def __init__(self, sim_estado: SimulacaoEstado, janela: float = JANELA_LOTE_EMPRESARIO,
+                 max_lote: int = MAX_NEGOCIACOES_CONCORRENTES):
+        self.sim_estado = sim_estado
+        self.janela = janela
+        self.max_lote = max_lote
+        self._aguardando = {}
+        self._disparo = None
+        # O loop só guarda referências fracas às tarefas; sem esta, um lote em andamento pode ser coletado.
+        self._tarefas = set()
+
+    async def responder(self, agr_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._aguardando[agr_id] = futuro
+        if len(self._aguardando) >= self.max_lote:
+            self._disparar()
+        elif self._disparo is None:
+            self._disparo = loop.call_later(self.janela, self._disparar)
+        await futuro
+
+    def _disparar(self):
+        if self._disparo: self._disparo.cancel()
+        self._disparo = None
+        lote, self._aguardando = self._aguardando, {}
+        if not lote: return
+        tarefa = asyncio.ensure_future(self._processar(lote))
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+
+    async def _processar(self, lote: dict):
+        ofertas = [o for agr_id in lote for o in self.sim_estado.ofertas_pendentes(agr_id)]
+        try:
+            if ofertas:
+                result = await agentes["Empresario"].ainvoke({"input": _entrada_empresario_lote(ofertas)},
+                                                             config=_config_agente("Empresario"))
+                print(f"\n[EMPRESARIO] Lote de {len(ofertas)} ofertas: {_limpar_saida_agente(result.get('output', ''))}")
+        except Exception as e:
+            for futuro in lote.values():
+                if not futuro.done(): futuro.set_exception(e)
+            return
+        for futuro in lote.values():
+            if not futuro.done(): futuro.set_result(None)
+
+
+async def empresario_node_async(state: GraphState, mesa: MesaEmpresario):
+    if _resolvido_pela_politica(state): return state
+    agr_id = state["current_agricultor_id"]
+    oferta = state["simulacao_estado"].oferta_aberta_de(agr_id)
+    oferta_id = oferta["oferta_id"] if oferta else None
+    await mesa.responder(agr_id)
+    return _responder_agricultor(state, oferta_id)
+
+
 def decide_proxima_acao(state: GraphState):
-    print(state["simulacao_estado"])
+    relatorio_passos.relatar(state["simulacao_estado"])
     state["iteracoes_negociacao"] += 1
-    print(f"\n[DECISÃO] Fim da iteração: {state['iteracoes_negociacao']}")
+    print(f"\n[DECISÃO] Fim da iteração: {state['iteracoes_negociacao']} ({state['current_agricultor_id']})")
 
-    if state["iteracoes_negociacao"] > 10:
+    if state["iteracoes_negociacao"] > MAX_ITERACOES_NEGOCIACAO:
         print(f"--- FIM DA NEGOCIAÇÃO: Limite de iterações excedido com {state['current_agricultor_id']} ---")
         state["next_action"] = "finalizar_ou_proximo"
         return state
 
-    negociacao = state["simulacao_estado"].negociacao_em_andamento
-    if negociacao['oferta_ativa']:
-        if negociacao['ultimo_ofertante'] == 'Agricultor':
-            state["next_action"] = "resposta_empresario"
-        else:
-            state["next_action"] = "resposta_agricultor"
+    oferta = state["simulacao_estado"].oferta_aberta_de(state["current_agricultor_id"])
+    if oferta and oferta['status'] == OFERTA_PENDENTE:
+        state["next_action"] = "resposta_empresario"
     else:
         state["next_action"] = "resposta_agricultor"
 
     print(f"Próxima ação definida: {state['next_action']}")
+    emitir("decisao", agricultor_id=state["current_agricultor_id"], iteracao=state["iteracoes_negociacao"],
+           proxima_acao=state["next_action"])
     return state
 
 
+def _estado_inicial_negociacao(agr_id: str, sim_estado: SimulacaoEstado) -> dict:
+    initial_message = HumanMessage(content=f"Olá, Agricultor {agr_id}. Sou o Empresário. O que você precisa hoje?")
+    return {"messages": [initial_message], "current_agricultor_id": agr_id, "simulacao_estado": sim_estado,
+            "next_action": "iniciar_negociacao", "iteracoes_negociacao": 0}
+
+
 def verificar_proximo_agricultor(state: GraphState):
     sim_estado = state["simulacao_estado"]
     ids_agricultores = list(sim_estado.agricultores.keys())
@@ -102,37 +331,53 @@ def verificar_proximo_agricultor(state: GraphState):
     if idx < len(ids_agricultores):
         curr_id = ids_agricultores[idx]
         print(f"\n\n--- INICIANDO NOVA NEGOCIAÇÃO COM AGRICULTOR: {curr_id} ---")
-        initial_message = HumanMessage(content=f"Olá, Agricultor {curr_id}. Sou o Empresário. O que você precisa hoje?")
-        return {"messages": [initial_message], "next_agricultor_idx": idx + 1, "current_agricultor_id": curr_id,
-                "simulacao_estado": sim_estado, "next_action": "iniciar_negociacao", "iteracoes_negociacao": 0}
+        return {**_estado_inicial_negociacao(curr_id, sim_estado), "next_agricultor_idx": idx + 1}
     else:
         print("\n--- TODOS OS AGRICULTORES JÁ NEGOCIARAM. ---")
         return {"next_action": "fim"}
 
 
-original_stdout = sys.stdout
-log_file = open("simulacao_log.txt", "w", encoding="utf-8")
-sys.stdout = Tee(original_stdout, log_file)
-try:
-    agricultores_config = {"Agr1": {"dinheiro": 6000.0, "parcelas": ["P1", "P2", "P3"]},
-                           "Agr2": {"dinheiro": 8000.0, "parcelas": ["T1", "T2"]}}
-    est_inicial = SimulacaoEstado(dinheiro_empresario_inicial=10000.0, agricultores_info=agricultores_config)
-    definir_recursos_globais(est_inicial)
+def encerrar_temporada_node(state: GraphState):
+    sim_estado = state["simulacao_estado"]
+    resumo = encerrar_temporada(sim_estado, regras_temporada)
+    emitir("temporada", nivel="resumo", **resumo)
+    print(f"\n--- FIM DA TEMPORADA {resumo['temporada']}: colheita R${resumo['receita_colheita']:.2f}, "
+          f"poluição {resumo['poluicao']} (perda {100 * resumo['perda_colheita']:.1f}%), "
+          f"multas R${resumo['multas']:.2f} ---")
+    if resumo["temporada"] >= state.get("n_temporadas", 1):
+        return {"next_action": "fim_simulacao"}
+    return {"next_action": "finalizar_ou_proximo", "next_agricultor_idx": 0}
+
+
+def _retomada(state: GraphState) -> str:
+    # O next_action de um checkpoint gravado por um nó de agente é o que levou a ele: a resposta já está no
+    # estado, falta só decidir a próxima ação.
+    if state.get("ultimo_no") in ("agricultor_node", "empresario_node"): return "decidir"
+    return state.get("next_action") or "finalizar_ou_proximo"
 
-    agentes = {}
-    emp_ag, agr_ags = inicializar_agentes(llm, list(est_inicial.agricultores.keys()))
-    agentes["Empresario"] = emp_ag
-    agentes["Agricultores"] = agr_ags
 
+def construir_grafo():
+    """Grafo sequencial: negocia com um agricultor de cada vez e, depois de todos, encerra a temporada."""
     workflow = StateGraph(GraphState)
-    workflow.add_node("verificar_proximo_agricultor", verificar_proximo_agricultor)
-    workflow.add_node("empresario_node", empresario_node)
-    workflow.add_node("agricultor_node", agricultor_node)
-    workflow.add_node("decide_proxima_acao", decide_proxima_acao)
-    workflow.set_entry_point("verificar_proximo_agricultor")
+    workflow.add_node("verificar_proximo_agricultor", _no("verificar_proximo_agricultor", verificar_proximo_agricultor))
+    workflow.add_node("empresario_node", _no("empresario_node", empresario_node, "Empresario"))
+    workflow.add_node("agricultor_node", _no("agricultor_node", agricultor_node))
+    workflow.add_node("decide_proxima_acao", _no("decide_proxima_acao", decide_proxima_acao))
+    workflow.add_node("encerrar_temporada", _no("encerrar_temporada", encerrar_temporada_node))
+    # Uma execução nova começa pelo primeiro agricultor; uma retomada continua de onde o checkpoint parou.
+    workflow.add_conditional_edges(START, _retomada,
+                                   {"decidir": "decide_proxima_acao",
+                                    "iniciar_negociacao": "agricultor_node",
+                                    "resposta_empresario": "empresario_node",
+                                    "resposta_agricultor": "agricultor_node",
+                                    "finalizar_ou_proximo": "verificar_proximo_agricultor",
+                                    "fim": "encerrar_temporada",
+                                    "fim_simulacao": END})
 
     workflow.add_conditional_edges("verificar_proximo_agricultor", lambda state: state["next_action"],
-                                   {"iniciar_negociacao": "agricultor_node", "fim": END})
+                                   {"iniciar_negociacao": "agricultor_node", "fim": "encerrar_temporada"})
+    workflow.add_conditional_edges("encerrar_temporada", lambda state: state["next_action"],
+                                   {"finalizar_ou_proximo": "verificar_proximo_agricultor", "fim_simulacao": END})
 
     workflow.add_edge("empresario_node", "decide_proxima_acao")
     workflow.add_edge("agricultor_node", "decide_proxima_acao")
@@ -141,22 +386,279 @@ try:
                                    {"resposta_empresario": "empresario_node",
                                     "resposta_agricultor": "agricultor_node",
                                     "finalizar_ou_proximo": "verificar_proximo_agricultor"})
+    return workflow.compile(checkpointer=None)
+
+
+def construir_subgrafo_negociacao(mesa: MesaEmpresario):
+    """Subgrafo assíncrono com a negociação de um único agricultor."""
+    async def empresario_node_mesa(state: GraphState):
+        return await empresario_node_async(state, mesa)
+
+    workflow = StateGraph(GraphState)
+    workflow.add_node("empresario_node", _no("empresario_node", empresario_node_mesa, "Empresario"))
+    workflow.add_node("agricultor_node", _no("agricultor_node", agricultor_node_async))
+    workflow.add_node("decide_proxima_acao", _no("decide_proxima_acao", decide_proxima_acao))
+    workflow.set_entry_point("agricultor_node")
+
+    workflow.add_edge("empresario_node", "decide_proxima_acao")
+    workflow.add_edge("agricultor_node", "decide_proxima_acao")
 
-    app = workflow.compile(checkpointer=None)
-    print("--- INICIANDO SIMULAÇÃO DE NEGOCIAÇÃO (MODELO GORIM) ---")
-    print(est_inicial)
-
-    initial_graph_state = {"next_agricultor_idx": 0, "simulacao_estado": est_inicial, "messages": [],
-                           "iteracoes_negociacao": 0}
-
-    for s in app.stream(initial_graph_state, config={'recursion_limit': 150}):
-        if "__end__" in s: break
-except Exception as e:
-    print(f"\nERRO GRAVE NA EXECUÇÃO DO GRAFO: {str(e)}")
-    print("Finalizando simulação prematuramente...")
-finally:
-    print("\n--- FIM DA SIMULAÇÃO ---")
-    print(est_inicial)
-    sys.stdout = original_stdout
-    log_file.close()
-    print("\nLog da simulação salvo em 'simulacao_log.txt'")
\ No newline at end of file
+    workflow.add_conditional_edges("decide_proxima_acao", lambda state: state["next_action"],
+                                   {"resposta_empresario": "empresario_node",
+                                    "resposta_agricultor": "agricultor_node",
+                                    "finalizar_ou_proximo": END})
+    return workflow.compile(checkpointer=None)
+
+
+def construir_grafo_concorrente(sim_estado: SimulacaoEstado, max_concorrencia: int = MAX_NEGOCIACOES_CONCORRENTES):
+    """
+    Grafo concorrente: cada agricultor negocia em um ramo próprio, limitado por `max_concorrencia`.
+    As ofertas dos ramos são respondidas em lote pelo Empresário (ver `MesaEmpresario`). Quando todos
+    os ramos terminam, a temporada é encerrada e uma nova rodada de ramos começa.
+    """
+    subgrafo = construir_subgrafo_negociacao(MesaEmpresario(sim_estado, max_lote=max_concorrencia))
+    semaforo = asyncio.Semaphore(max_concorrencia)
+
+    def distribuir_agricultores(state: GraphState):
+        sim_estado = state["simulacao_estado"]
+        return [Send("negociar_agricultor", {"current_agricultor_id": agr_id, "simulacao_estado": sim_estado})
+                for agr_id in sim_estado.agricultores]
+
+    def proxima_temporada(state: GraphState):
+        return END if state["next_action"] == "fim_simulacao" else distribuir_agricultores(state)
+
+    async def negociar_agricultor(state: GraphState):
+        agr_id = state["current_agricultor_id"]
+        async with semaforo:
+            print(f"\n\n--- INICIANDO NOVA NEGOCIAÇÃO COM AGRICULTOR: {agr_id} ---")
+            final = await subgrafo.ainvoke(_estado_inicial_negociacao(agr_id, state["simulacao_estado"]),
+                                           config={'recursion_limit': 4 * MAX_ITERACOES_NEGOCIACAO})
+        print(f"\n--- NEGOCIAÇÃO COM {agr_id} CONCLUÍDA ---")
+        return {"negociacoes_concluidas": [{"agricultor_id": agr_id,
+                                            "iteracoes": final["iteracoes_negociacao"]}]}
+
+    workflow = StateGraph(GraphState)
+    workflow.add_node("negociar_agricultor", _no("negociar_agricultor", negociar_agricultor))
+    workflow.add_node("encerrar_temporada", _no("encerrar_temporada", encerrar_temporada_node))
+    workflow.add_conditional_edges(START, distribuir_agricultores, ["negociar_agricultor"])
+    workflow.add_edge("negociar_agricultor", "encerrar_temporada")
+    workflow.add_conditional_edges("encerrar_temporada", proxima_temporada, ["negociar_agricultor", END])
+    return workflow.compile(checkpointer=None)
+
+
+def inicializar_simulacao(agricultores_config: dict, dinheiro_empresario: float = 10000.0,
+                          politica: PoliticaEmpresario = None, modelo: ChatOpenAI = None,
+                          historico: GerenciadorHistorico = None, verbose: bool = False,
+                          estado: SimulacaoEstado = None, regras: RegrasTemporada = None,
+                          catalogo: dict = None, streaming: bool = False,
+                          limite_raciocinio: int = None) -> SimulacaoEstado:
+    global politica_empresario, gerenciador_historico, regras_temporada
+    politica_empresario = politica
+    if historico: gerenciador_historico = historico
+    if regras: regras_temporada = regras
+    est_inicial = estado or SimulacaoEstado(dinheiro_empresario_inicial=dinheiro_empresario,
+                                            agricultores_info=agricultores_config)
+    definir_recursos(est_inicial, catalogo)
+
+    emp_ag, agr_ags = inicializar_agentes(modelo or llm, list(est_inicial.agricultores.keys()), verbose,
+                                          streaming, limite_raciocinio)
+    agentes["Empresario"] = emp_ag
+    agentes["Agricultores"] = agr_ags
+    return est_inicial
+
+
+def limite_recursao(n_agricultores: int, n_temporadas: int = 1) -> int:
+    """
+    Passos do grafo sequencial: até 2 nós por iteração de cada negociação, mais a troca de agricultor,
+    mais o fim de cada temporada.
+    """
+    por_temporada = n_agricultores * (2 * (MAX_ITERACOES_NEGOCIACAO + 1) + 1) + 2
+    return max(150, n_temporadas * por_temporada + 10)
+
+
+def estado_inicial_grafo(est_inicial: SimulacaoEstado, n_temporadas: int = 1) -> dict:
+    return {"next_agricultor_idx": 0, "simulacao_estado": est_inicial, "messages": [], "iteracoes_negociacao": 0,
+            "n_temporadas": n_temporadas}
+
+
+def executar_simulacao(est_inicial: SimulacaoEstado, armazem: ArmazemCheckpoints = None,
+                       estado_grafo: dict = None, passo_inicial: int = 0, n_temporadas: int = 1):
+    """
+    Executa o grafo sequencial. Com `armazem`, grava um checkpoint incremental a cada passo; com
+    `estado_grafo` (vindo de `ArmazemCheckpoints.carregar`), continua a partir dele.
+    """
+    app = construir_grafo()
+    passo, ultimo_no = passo_inicial, None
+
+    coletor.iniciar_execucao()
+    try:
+        estado_grafo = estado_grafo or estado_inicial_grafo(est_inicial, n_temporadas)
+        limite = limite_recursao(len(est_inicial.agricultores), estado_grafo.get("n_temporadas", n_temporadas))
+        for modo, s in app.stream(estado_grafo, config={'recursion_limit': limite},
+                                  stream_mode=["updates", "values"]):
+            if modo == "updates":
+                if "__end__" in s: break
+                ultimo_no = next(iter(s), None)
+            elif armazem and ultimo_no:
+                passo += 1
+                armazem.salvar(passo, ultimo_no, s)
+    finally:
+        coletor.finalizar_execucao()
+
+
+async def executar_simulacao_concorrente(est_inicial: SimulacaoEstado,
+                                         max_concorrencia: int = MAX_NEGOCIACOES_CONCORRENTES,
+                                         n_temporadas: int = 1):
+    app = construir_grafo_concorrente(est_inicial, max_concorrencia)
+    coletor.iniciar_execucao()
+    try:
+        final = await app.ainvoke({"simulacao_estado": est_inicial, "negociacoes_concluidas": [],
+                                   "n_temporadas": n_temporadas},
+                                  config={'recursion_limit': 3 * n_temporadas + 10})
+    finally:
+        coletor.finalizar_execucao()
+    return final["negociacoes_concluidas"]
+
+
+def _ler_argumentos():
+    parser = argparse.ArgumentParser(description="Simulação de negociação (modelo Gorim).")
+    parser.add_argument("--concorrente", action="store_true",
+                        help="Negocia com todos os agricultores em paralelo.")
+    parser.add_argument("--max-concorrencia", type=int, default=MAX_NEGOCIACOES_CONCORRENTES,
+                        help="Número máximo de negociações simultâneas no modo concorrente.")
+    parser.add_argument("--sem-politica", action="store_true",
+                        help="Envia todas as ofertas ao Empresário LLM, sem o pré-filtro de regras.")
+    parser.add_argument("--fator-aceite", type=float, default=1.0,
+                        help="Aceita sem LLM ofertas >= fator x preço de tabela.")
+    parser.add_argument("--fator-rejeicao", type=float, default=0.5,
+                        help="Rejeita sem LLM ofertas < fator x preço de tabela.")
+    parser.add_argument("--orcamento-tokens-historico", type=int, default=1200,
+                        help="Tokens (estimados) máximos do histórico enviado a cada chamada.")
+    parser.add_argument("--turnos-historico", type=int, default=6,
+                        help="Número máximo de mensagens recentes mantidas no histórico.")
+    parser.add_argument("--eventos-arquivo", default="simulacao_eventos.jsonl",
+                        help="Arquivo JSON Lines com os eventos estruturados da simulação.")
+    parser.add_argument("--nivel-eventos", choices=list(NIVEIS), default="info",
+                        help="resumo: transações e plantios; info: + nós, ferramentas e decisões; debug: + chamadas ao LLM.")
+    parser.add_argument("--log-texto", action="store_true",
+                        help="Também grava a saída legível do console em 'simulacao_log.txt'.")
+    parser.add_argument("--despejo-estado", type=int, nargs="?", const=1, default=0, metavar="N",
+                        help="Imprime o estado completo da simulação a cada N passos (sem N: a cada passo; lento). "
+                             "Sem a opção, cada passo mostra só o que mudou.")
+    parser.add_argument("--relatorio-desempenho", default="relatorio_desempenho.json",
+                        help="Arquivo JSON com tempos, tokens e erros por nó, agente e ferramenta.")
+    parser.add_argument("--temporadas", type=int, default=1,
+                        help="Número de temporadas (compra -> plantio -> colheita -> poluição).")
+    parser.add_argument("--perda-poluicao", type=float, default=0.0005,
+                        help="Fração da colheita perdida por unidade de poluição média da temporada.")
+    parser.add_argument("--multa-poluicao", type=float, default=0.5,
+                        help="Multa (R$) por unidade de poluição de cada plantio.")
+    parser.add_argument("--estado-compacto", action="store_true",
+                        help="Guarda o estado em arrays NumPy (recomendado para milhares de agricultores).")
+    parser.add_argument("--transacoes-dir", default=None, metavar="DIRETORIO",
+                        help="Grava os segmentos cheios do livro de transações em arquivos .npy (memory-map).")
+    parser.add_argument("--transacoes-limite-memoria", type=int, default=100_000,
+                        help="Transações mantidas em memória antes de congelar um segmento do livro.")
+    parser.add_argument("--transacoes-parquet", default=None, metavar="ARQUIVO",
+                        help="Exporta o livro de transações em Parquet no fim da execução (requer pyarrow).")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Consome as respostas do LLM em streaming, descartando <think> e parando na primeira "
+                             "chamada de ferramenta.")
+    parser.add_argument("--limite-raciocinio", type=int, default=None, metavar="TOKENS",
+                        help="Com --streaming: corta o raciocínio que passar deste número de tokens e pede a ação direto.")
+    parser.add_argument("--checkpoint", default=None, metavar="ARQUIVO",
+                        help="Grava checkpoints incrementais em um SQLite (somente no modo sequencial).")
+    parser.add_argument("--retomar", default=None, metavar="ultimo|EXEC[:PASSO]",
+                        help="Retoma (ou bifurca) a partir de um checkpoint do arquivo --checkpoint.")
+    parser.add_argument("--cache-llm", choices=MODOS, default=MODO_DIRETO,
+                        help="gravar: usa e grava o cache; reproduzir: só usa o cache (falha se faltar); direto: sem cache.")
+    parser.add_argument("--cache-arquivo", default="cache_llm.sqlite", help="Arquivo SQLite do cache do LLM.")
+    parser.add_argument("--cache-max-entradas", type=int, default=50000,
+                        help="Número máximo de respostas no cache (as menos usadas são removidas).")
+    args = parser.parse_args()
+    if args.retomar and not args.checkpoint: parser.error("--retomar exige --checkpoint.")
+    if args.checkpoint and args.concorrente: parser.error("--checkpoint só é suportado no modo sequencial.")
+    if args.despejo_estado < 0: parser.error("--despejo-estado deve ser >= 0.")
+    if args.transacoes_limite_memoria < 1: parser.error("--transacoes-limite-memoria deve ser >= 1.")
+    if args.limite_raciocinio is not None and not args.streaming: parser.error("--limite-raciocinio exige --streaming.")
+    if args.transacoes_parquet and not importlib.util.find_spec("pyarrow"):
+        parser.error("--transacoes-parquet exige o pacote pyarrow.")
+    return args
+
+
+if __name__ == "__main__":
+    args = _ler_argumentos()
+    original_stdout = sys.stdout
+    log_file = None
+    if args.log_texto:
+        log_file = open("simulacao_log.txt", "w", encoding="utf-8")
+        sys.stdout = Tee(original_stdout, log_file)
+    registro = RegistroEventos(args.eventos_arquivo, args.nivel_eventos)
+    definir_registro(registro)
+    relatorio_passos.intervalo_completo = args.despejo_estado
+    est_inicial = None
+    cache = None
+    armazem = None
+    try:
+        agricultores_config = {"Agr1": {"dinheiro": 6000.0, "parcelas": ["P1", "P2", "P3"]},
+                               "Agr2": {"dinheiro": 8000.0, "parcelas": ["T1", "T2"]}}
+        politica = None if args.sem_politica else PoliticaEmpresario(args.fator_aceite, args.fator_rejeicao)
+        if args.cache_llm != MODO_DIRETO:
+            cache = CacheRespostasLLM(args.cache_arquivo, args.cache_llm, args.cache_max_entradas)
+        historico = GerenciadorHistorico(args.orcamento_tokens_historico, args.turnos_historico)
+        livro = LivroTransacoes(args.transacoes_dir, args.transacoes_limite_memoria)
+        estado_grafo, origem = None, None
+        if args.checkpoint:
+            armazem = ArmazemCheckpoints(args.checkpoint)
+            if args.retomar:
+                origem = armazem.localizar(args.retomar)
+                estado_grafo = armazem.carregar(*origem, livro_transacoes=livro)
+                print(f"--- RETOMANDO DO CHECKPOINT {origem[0]}:{origem[1]} ---")
+            print(f"--- EXECUÇÃO {armazem.nova_execucao(origem)} (checkpoints em '{args.checkpoint}') ---")
+        estado = estado_grafo["simulacao_estado"] if estado_grafo else None
+        if args.estado_compacto:
+            estado = SimulacaoEstadoCompacto.de_estado(estado) if estado \
+                else SimulacaoEstadoCompacto(10000.0, agricultores_config, livro)
+            if estado_grafo: estado_grafo["simulacao_estado"] = estado
+        elif not estado:
+            estado = SimulacaoEstado(10000.0, agricultores_config, livro)
+        est_inicial = inicializar_simulacao(agricultores_config, politica=politica, modelo=criar_llm(cache),
+                                            historico=historico, verbose=registro.ativo("debug"), estado=estado,
+                                            streaming=args.streaming, limite_raciocinio=args.limite_raciocinio,
+                                            regras=RegrasTemporada(perda_por_poluicao=args.perda_poluicao,
+                                                                   multa_por_poluicao=args.multa_poluicao))
+
+        print("--- INICIANDO SIMULAÇÃO DE NEGOCIAÇÃO (MODELO GORIM) ---")
+        print(est_inicial)
+
+        if args.concorrente:
+            asyncio.run(executar_simulacao_concorrente(est_inicial, args.max_concorrencia, args.temporadas))
+        else:
+            executar_simulacao(est_inicial, armazem, estado_grafo, origem[1] if origem else 0, args.temporadas)
+    except Exception as e:
+        emitir("erro_grave", nivel="resumo", erro=repr(e))
+        print(f"\nERRO GRAVE NA EXECUÇÃO DO GRAFO: {str(e)}")
+        print("Finalizando simulação prematuramente...")
+        if armazem and armazem.ultimo_passo is not None:
+            print(f"Para continuar: --checkpoint {args.checkpoint} --retomar {armazem.execucao_id}:{armazem.ultimo_passo}")
+    finally:
+        print("\n--- FIM DA SIMULAÇÃO ---")
+        print(est_inicial)
+        if est_inicial: print(est_inicial.transacoes_registradas.resumo())
+        if est_inicial and args.transacoes_parquet:
+            est_inicial.transacoes_registradas.exportar_parquet(args.transacoes_parquet)
+            print(f"Transações exportadas para '{args.transacoes_parquet}'")
+        if politica_empresario: print(politica_empresario.resumo())
+        if cache: print(cache.resumo())
+        print(contador_tokens.resumo())
+        print("\n--- DESEMPENHO ---")
+        print(coletor.tabela_resumo())
+        coletor.exportar_json(args.relatorio_desempenho)
+        registro.fechar()
+        if armazem: armazem.fechar()
+        sys.stdout = original_stdout
+        if log_file:
+            log_file.close()
+            print("\nLog da simulação salvo em 'simulacao_log.txt'")
+        print(f"Eventos da simulação salvos em '{args.eventos_arquivo}'")
+        print(f"Relatório de desempenho salvo em '{args.relatorio_desempenho}'")
@@ -0,0 +1,53 @@
+# temporadas.py
+
+from estado import SimulacaoEstado
+
+
+class RegrasTemporada:
+    """
+    Parâmetros do fim de temporada do Jogo Gorim: colheita, efeitos da poluição e devolução das máquinas.
+    A perda de colheita cresce com a poluição média gerada na temporada (poluição é um problema coletivo);
+    a multa é individual, proporcional à poluição de cada plantio.
+    """
+    def __init__(self, fator_colheita: float = 1.0, perda_por_poluicao: float = 0.0005, perda_maxima: float = 0.9,
+                 multa_por_poluicao: float = 0.5, devolver_maquinas: bool = True):
+        self.fator_colheita = fator_colheita
+        self.perda_por_poluicao = perda_por_poluicao
+        self.perda_maxima = perda_maxima
+        self.multa_por_poluicao = multa_por_poluicao
+        self.devolver_maquinas = devolver_maquinas
+
+
+def encerrar_temporada(estado: SimulacaoEstado, regras: RegrasTemporada) -> dict:
+    """
+    Colhe, aplica a poluição, limpa as parcelas e abre a próxima temporada. Só percorre os plantios e
+    os agricultores ativos desta temporada, nunca o histórico de transações.
+    """
+    agregados = estado.agregados_temporada
+    n_agricultores = len(estado.agricultores)
+    poluicao_media = agregados["poluicao"] / n_agricultores if n_agricultores else 0.0
+    perda = min(regras.perda_maxima, regras.perda_por_poluicao * poluicao_media)
+
+    receita_colheita, total_multas = 0.0, 0.0
+    for agr_id, parcela_id, produtividade, poluicao in estado.plantios_temporada:
+        info = estado.agricultores[agr_id]
+        colheita = produtividade * regras.fator_colheita * (1.0 - perda)
+        # A multa não deixa o agricultor com saldo negativo.
+        multa = min(poluicao * regras.multa_por_poluicao, info["dinheiro"] + colheita)
+        info["dinheiro"] += colheita - multa
+        info["parcelas"][parcela_id] = None
+        estado.marcar(agr_id, "dinheiro", "parcelas")
+        receita_colheita += colheita
+        total_multas += multa
+
+    if regras.devolver_maquinas:
+        for agr_id in estado.agricultores_ativos_temporada:
+            estado.agricultores[agr_id]["inventario"]["maquina_alugada"].clear()
+            estado.marcar(agr_id, "inventario")
+
+    resumo = {"temporada": estado.temporada_atual, **agregados, "poluicao_media": poluicao_media,
+              "perda_colheita": perda, "receita_colheita": receita_colheita, "multas": total_multas,
+              "agricultores_ativos": len(estado.agricultores_ativos_temporada)}
+    estado.historico_temporadas.append(resumo)
+    estado.iniciar_temporada()
+    return resumo